@@ -422,39 +422,44 @@ def mole_cricket_fight(state):
             print("Inside: the *Bag of Doobies*.")
             state.inventory.append("Bag of Doobies")
             state.flags["beat_mole_cricket"] = True
-            state.move_to("town")
+            sheriff_clovis_chase()
+            state.move_to("strip_club")
         else:
             print("\nTravis stumbles away, hacking and humiliated. He'll need to come back stronger.")
             state.move_to("dirt_road")
 
-print(
-    "Travis grabs the Bag of Doobies and hears tires screech in the distance. "
-    "A voice echoes from a megaphone:\n\n"
-    "\"TRAVIS VAELEN, STEP AWAY FROM THE STASH AND PUT YOUR HANDS WHERE I CAN SEE 'EM!\"\n"
-)
-
-print(
-    "Sheriff Clovis appears, less man than legal liability, careening through the palmettos with righteous rage. "
-    "Travis vaults a beer cooler, flips the bird, and sprints toward the Toyota.\n"
-)
-
-print(
-    "With a roar of the engine and a cloud of vape smoke, Travis hauls ass down the dirt road. "
-    "Sirens wail. A possum screams. A Bible page flies through the air.\n"
-)
-
-print(
-    "He jerks the wheel hard right, catching a ditch ramp and *airborne Yeehaws* his way outta sight.\n"
-)
-
-print(
-    "The cruiser crashes into a port-a-john. Blue goo sprays everywhere.\n"
-    "Clovis emerges, dripping and furious: \"DAMN IT, VAELEN! THIS AIN'T OVER!\"\n"
-)
-
-print(
-    "Minutes later, Travis strolls into the strip club parking lot like he didn’t just reenact all of *Smokey and the Bandit*."
-)
+
+def sheriff_clovis_chase():
+    """Tell the Sheriff Clovis chase between the Mud Hole and the strip club."""
+    print(
+        "Travis grabs the Bag of Doobies and hears tires screech in the distance. "
+        "A voice echoes from a megaphone:\n\n"
+        "\"TRAVIS VAELEN, STEP AWAY FROM THE STASH AND PUT YOUR HANDS WHERE I CAN SEE 'EM!\"\n"
+    )
+
+    print(
+        "Sheriff Clovis appears, less man than legal liability, careening through the palmettos with righteous rage. "
+        "Travis vaults a beer cooler, flips the bird, and sprints toward the Toyota.\n"
+    )
+
+    print(
+        "With a roar of the engine and a cloud of vape smoke, Travis hauls ass down the dirt road. "
+        "Sirens wail. A possum screams. A Bible page flies through the air.\n"
+    )
+
+    print(
+        "He jerks the wheel hard right, catching a ditch ramp and *airborne Yeehaws* his way outta sight.\n"
+    )
+
+    print(
+        "The cruiser crashes into a port-a-john. Blue goo sprays everywhere.\n"
+        "Clovis emerges, dripping and furious: \"DAMN IT, VAELEN! THIS AIN'T OVER!\"\n"
+    )
+
+    print(
+        "Minutes later, Travis strolls into the strip club parking lot like he didn’t just reenact all of *Smokey and the Bandit*."
+    )
+
 
 def stage_backroom_intro(state):
     print(
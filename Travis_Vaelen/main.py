@@ -1,2 +1,7 @@
-print("Welcome to the Dungeon, y’all. Name's Travis.")
-print("We’re gonna get weird in here.")
+def main():
+    print("Welcome to the Dungeon, y’all. Name's Travis.")
+    print("We’re gonna get weird in here.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Terminal art: the PNGs in Assets drawn with ANSI truecolor half blocks.
+
+    python art.py trailer_interrior
+    python art.py swamp_god --width 48
+
+Each character cell shows two pixels stacked, the upper one as the
+foreground of a ``▀`` and the lower one as its background.  Decoding
+goes through Pillow and the downscale is a NumPy box average over the
+whole image at once, so even the 1536px portraits take milliseconds
+rather than the seconds a per-pixel loop would.  Finished renders are
+cached on disk under the asset's content hash and the target width;
+after the first time, showing a picture is one small file read.
+"""
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+import assets
+from atlas import Atlas
+
+CACHE_DIR = os.environ.get("SWAMP_ART_CACHE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "swamp", "art"
+)
+DEFAULT_WIDTH = 64
+
+# pixels less opaque than this count as see-through
+OPAQUE = 128
+RESET = "\x1b[0m"
+
+
+def decode(data):
+    """PNG bytes -> ``(height, width, 3 or 4)`` uint8 RGB or RGBA array."""
+    with Image.open(io.BytesIO(data)) as image:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        return np.asarray(image)
+
+
+def _edges(size, cells):
+    return np.arange(cells) * size // cells
+
+
+def _box_sum(pixels, row_edges, column_edges):
+    sums = np.add.reduceat(pixels, row_edges, axis=0, dtype=np.uint64)
+    return np.add.reduceat(sums, column_edges, axis=1)
+
+
+def downscale(pixels, width):
+    """Box-average ``pixels`` down to ``width`` columns of RGBA.
+
+    The height keeps the aspect ratio and comes out even, since every
+    character cell is two pixels tall.  Colours are averaged weighted by
+    alpha so transparent edges don't bleed black into an icon.
+    """
+    height, columns = pixels.shape[:2]
+    width = max(1, min(width, columns))
+    rows = max(2, round(height * width / columns / 2) * 2)
+    rows = min(rows, height - height % 2 or 2)
+    row_edges, column_edges = _edges(height, rows), _edges(columns, width)
+    counts = np.outer(np.diff(row_edges, append=height), np.diff(column_edges, append=columns))
+    out = np.empty((rows, width, 4), np.uint8)
+    if pixels.shape[2] == 3 or pixels[..., 3].min() == 255:
+        rgb = _box_sum(pixels[..., :3], row_edges, column_edges) / counts[..., None]
+        out[..., 3] = 255
+    else:
+        alpha = pixels[..., 3:].astype(np.uint32)
+        coverage = _box_sum(alpha[..., 0], row_edges, column_edges)
+        rgb = _box_sum(pixels[..., :3] * alpha, row_edges, column_edges)
+        rgb = rgb / np.maximum(coverage, 1)[..., None]
+        out[..., 3] = np.rint(coverage / counts)
+    out[..., :3] = np.rint(rgb)
+    return out
+
+
+def to_ansi(cells):
+    """Turn an even-height RGBA array into rows of half-block characters."""
+    top, bottom = cells[0::2], cells[1::2]
+    shown_top = (top[..., 3] >= OPAQUE).tolist()
+    shown_bottom = (bottom[..., 3] >= OPAQUE).tolist()
+    top_rgb = top[..., :3].tolist()
+    bottom_rgb = bottom[..., :3].tolist()
+    lines = []
+    for y, (up_row, down_row) in enumerate(zip(shown_top, shown_bottom)):
+        parts = []
+        for x, (up, down) in enumerate(zip(up_row, down_row)):
+            if up and down:
+                parts.append("\x1b[38;2;%d;%d;%dm\x1b[48;2;%d;%d;%dm▀" % (*top_rgb[y][x], *bottom_rgb[y][x]))
+            elif up:
+                parts.append("\x1b[49m\x1b[38;2;%d;%d;%dm▀" % tuple(top_rgb[y][x]))
+            elif down:
+                parts.append("\x1b[49m\x1b[38;2;%d;%d;%dm▄" % tuple(bottom_rgb[y][x]))
+            else:
+                parts.append(RESET + " ")
+        lines.append("".join(parts) + RESET)
+    return "\n".join(lines)
+
+
+def render(data, width=DEFAULT_WIDTH):
+    """PNG bytes -> ANSI art at most ``width`` columns wide."""
+    return to_ansi(downscale(decode(data), width))
+
+
+class ArtRenderer:
+    """Renders assets by ID, going through the on-disk cache.
+
+    An instance is the ``art`` callable a ``GameState`` takes:
+    ``art(asset_id, width)`` returns the picture as one string.  Icons
+    in the atlas are drawn straight from its mapped pixels and kept in
+    memory, so showing the inventory touches no files at all.
+    """
+
+    def __init__(self, manager=None, cache_dir=CACHE_DIR, atlas=None):
+        self.manager = manager or assets.AssetManager()
+        self.cache_dir = cache_dir
+        if atlas is None:
+            try:
+                atlas = Atlas.open(self.manager.directory)
+            except FileNotFoundError:
+                pass
+        self.atlas = atlas
+        self.icons = {}
+
+    def cache_path(self, key, width):
+        digest = self.manager.info(key)["sha256"]
+        return os.path.join(self.cache_dir, f"{digest[:32]}-{width}.ans")
+
+    def __call__(self, key, width=DEFAULT_WIDTH):
+        if self.atlas is not None and key in self.atlas:
+            text = self.icons.get((key, width))
+            if text is None:
+                text = self.icons[key, width] = to_ansi(downscale(self.atlas.pixels(key), width))
+            return text
+        path = self.cache_path(key, width)
+        try:
+            with open(path, encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            pass
+        text = render(self.manager.get(key), width)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write then rename, so a reader never sees half a picture
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(temp, path)
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show an asset as terminal art.")
+    parser.add_argument("asset", help="asset ID from the manifest")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH)
+    parser.add_argument("--no-cache", action="store_true", help="render from scratch")
+    args = parser.parse_args(argv)
+    manager = assets.AssetManager()
+    if args.asset not in manager:
+        parser.error(f"unknown asset {args.asset!r}; see {assets.MANIFEST}")
+    if args.no_cache:
+        print(render(manager.get(args.asset), args.width))
+    else:
+        print(ArtRenderer(manager)(args.asset, args.width))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""The art in Travis_Vaelen/Assets, looked up by ID and loaded on demand.
+
+    python assets.py              # rebuild Assets/manifest.json
+    python assets.py --check      # fail if the manifest is out of date
+
+The manifest lists every image once: a stable ID made from its file
+name, the file, its size in bytes, its dimensions and a content hash.
+Building it only reads PNG headers, so it needs no imaging library.
+
+An ``AssetManager`` reads nothing until an asset is asked for, then
+keeps recently used files in an LRU cache that stays under a byte
+budget.  The eight big 1024x1536 paintings are about 3 MB each, so a
+worker holding all of them would carry 22 MB it almost never needs.
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+from collections import OrderedDict
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Travis_Vaelen", "Assets")
+MANIFEST = "manifest.json"
+EXTENSIONS = (".png",)
+
+# room for one of the big paintings plus every icon
+DEFAULT_BUDGET = 4 << 20
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# length, chunk type, then IHDR's width and height
+_IHDR = struct.Struct(">I4sII")
+
+
+def asset_id(filename):
+    """``"Lt. Waddlebottom, USF.png"`` -> ``"lt_waddlebottom_usf"``."""
+    stem = os.path.splitext(filename)[0].lower()
+    return "_".join("".join(c if c.isalnum() else " " for c in stem).split())
+
+
+def png_size(data):
+    """Width and height from a PNG's header."""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    _, chunk, width, height = _IHDR.unpack_from(data, len(PNG_SIGNATURE))
+    if chunk != b"IHDR":
+        raise ValueError("PNG file doesn't start with an IHDR chunk")
+    return width, height
+
+
+def build_manifest(directory=ASSET_DIR):
+    """Scan ``directory`` and describe every image in it, keyed by ID."""
+    manifest = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(EXTENSIONS):
+            continue
+        with open(os.path.join(directory, filename), "rb") as file:
+            data = file.read()
+        key = asset_id(filename)
+        if key in manifest:
+            raise ValueError(f"{filename!r} and {manifest[key]['file']!r} both map to {key!r}")
+        width, height = png_size(data)
+        manifest[key] = {
+            "file": filename,
+            "bytes": len(data),
+            "width": width,
+            "height": height,
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+    return manifest
+
+
+def read_manifest(directory=ASSET_DIR):
+    with open(os.path.join(directory, MANIFEST)) as file:
+        return json.load(file)
+
+
+def write_manifest(manifest, directory=ASSET_DIR):
+    with open(os.path.join(directory, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+class AssetManager:
+    """Lazily loads assets by ID and keeps at most ``budget`` bytes of them.
+
+    ``get`` returns a file's bytes, reading it on first use and again
+    only after it's been evicted.  Anything bigger than the whole
+    budget is handed back without being cached at all.
+    """
+
+    def __init__(self, directory=ASSET_DIR, budget=DEFAULT_BUDGET, verify=False):
+        self.directory = directory
+        self.budget = budget
+        # check each file against its manifest hash as it's read
+        self.verify = verify
+        self.manifest = read_manifest(directory)
+        self.cache = OrderedDict()
+        self.held = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.manifest
+
+    def info(self, key):
+        """The manifest entry for ``key``; reads nothing from disk."""
+        try:
+            return self.manifest[key]
+        except KeyError:
+            raise KeyError(f"no asset called {key!r}") from None
+
+    def get(self, key):
+        data = self.cache.get(key)
+        if data is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return data
+        self.misses += 1
+        entry = self.info(key)
+        with open(os.path.join(self.directory, entry["file"]), "rb") as file:
+            data = file.read()
+        if self.verify and hashlib.sha256(data).hexdigest() != entry["sha256"]:
+            raise ValueError(f"{entry['file']} doesn't match the manifest; rebuild it")
+        if len(data) <= self.budget:
+            self.cache[key] = data
+            self.held += len(data)
+            self._evict()
+        return data
+
+    def _evict(self):
+        while self.held > self.budget:
+            _, data = self.cache.popitem(last=False)
+            self.held -= len(data)
+            self.evictions += 1
+
+    def clear(self):
+        self.cache.clear()
+        self.held = 0
+
+    def stats(self):
+        return {
+            "held": self.held,
+            "budget": self.budget,
+            "cached": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild or check the asset manifest.")
+    parser.add_argument("--dir", default=ASSET_DIR)
+    parser.add_argument("--check", action="store_true", help="exit 1 if the manifest is stale")
+    args = parser.parse_args(argv)
+    manifest = build_manifest(args.dir)
+    if args.check:
+        try:
+            current = read_manifest(args.dir)
+        except FileNotFoundError:
+            current = None
+        if current != manifest:
+            print(f"{os.path.join(args.dir, MANIFEST)} is out of date; run assets.py")
+            return 1
+        print(f"manifest up to date: {len(manifest)} assets")
+        return 0
+    write_manifest(manifest, args.dir)
+    total = sum(entry["bytes"] for entry in manifest.values())
+    print(f"wrote {len(manifest)} assets ({total / 1e6:.1f} MB) to {MANIFEST}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Packing the small icons into one atlas file.
+
+    python atlas.py            # rebuild Assets/atlas.bin from the manifest
+    python atlas.py --check    # fail if the atlas is out of date
+
+Every image in the manifest no bigger than ``MAX_ICON`` on either side
+goes into one RGBA sheet, packed in shelves tallest first.  The file is
+a small header, a rectangle per icon, the icon IDs and then the raw
+pixels, already decoded.  At runtime ``Atlas.open`` maps the file once
+and every icon is a NumPy view into it: no per-icon open, read or PNG
+decode, and no file names with spaces and apostrophes anywhere near it.
+"""
+import argparse
+import hashlib
+import io
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+import assets
+
+ATLAS = "atlas.bin"
+MAX_ICON = 96
+SHEET_WIDTH = 256
+
+MAGIC = b"SWMPATLS"
+VERSION = 1
+# magic, version, sheet width, sheet height, icon count, length of the ID
+# table, and a digest of the source files so a stale atlas can be spotted
+HEADER = struct.Struct("<8sBHHHI32s")
+# x, y, width, height
+RECT = struct.Struct("<HHHH")
+
+
+def icons(manifest):
+    """IDs of the manifest entries small enough to go in the atlas."""
+    return sorted(
+        key for key, entry in manifest.items()
+        if entry["width"] <= MAX_ICON and entry["height"] <= MAX_ICON
+    )
+
+
+def source_digest(manifest, keys):
+    digest = hashlib.sha256()
+    for key in keys:
+        digest.update(f"{key}:{manifest[key]['sha256']}\n".encode())
+    return digest.digest()
+
+
+def pack(sizes, width=SHEET_WIDTH):
+    """Shelf-pack ``{key: (w, h)}``; returns ``({key: (x, y, w, h)}, height)``."""
+    rects = {}
+    x = y = shelf = 0
+    for key in sorted(sizes, key=lambda key: (-sizes[key][1], -sizes[key][0], key)):
+        w, h = sizes[key]
+        if w > width:
+            raise ValueError(f"{key} is wider than the {width}px sheet")
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        rects[key] = (x, y, w, h)
+        x += w
+        shelf = max(shelf, h)
+    return rects, y + shelf
+
+
+def build(directory=assets.ASSET_DIR, width=SHEET_WIDTH):
+    """Pack the small icons and return the atlas file's bytes."""
+    from PIL import Image
+
+    manifest = assets.read_manifest(directory)
+    keys = icons(manifest)
+    sizes = {key: (manifest[key]["width"], manifest[key]["height"]) for key in keys}
+    rects, height = pack(sizes, width)
+    sheet = np.zeros((height, width, 4), np.uint8)
+    for key in keys:
+        with Image.open(os.path.join(directory, manifest[key]["file"])) as image:
+            pixels = np.asarray(image.convert("RGBA"))
+        x, y, w, h = rects[key]
+        sheet[y:y + h, x:x + w] = pixels
+    names = "\n".join(keys).encode()
+    out = io.BytesIO()
+    out.write(HEADER.pack(
+        MAGIC, VERSION, width, height, len(keys), len(names), source_digest(manifest, keys)
+    ))
+    for key in keys:
+        out.write(RECT.pack(*rects[key]))
+    out.write(names)
+    out.write(sheet.tobytes())
+    return out.getvalue()
+
+
+class Atlas:
+    """A packed icon sheet; ``atlas.pixels(key)`` is an RGBA view."""
+
+    def __init__(self, data):
+        magic, version, width, height, count, names_len, digest = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a swamp icon atlas")
+        if version != VERSION:
+            raise ValueError(f"unsupported atlas version {version}")
+        offset = HEADER.size + count * RECT.size
+        keys = bytes(data[offset:offset + names_len]).decode().split("\n") if count else []
+        self.rects = dict(zip(keys, RECT.iter_unpack(data[HEADER.size:offset])))
+        self.digest = digest
+        self.sheet = np.frombuffer(
+            data, np.uint8, width * height * 4, offset + names_len
+        ).reshape(height, width, 4)
+
+    @classmethod
+    def open(cls, directory=assets.ASSET_DIR):
+        """Map the atlas file in ``directory``; one open, no reads per icon."""
+        with open(os.path.join(directory, ATLAS), "rb") as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __contains__(self, key):
+        return key in self.rects
+
+    def pixels(self, key):
+        x, y, w, h = self.rects[key]
+        return self.sheet[y:y + h, x:x + w]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack the small icons into one atlas.")
+    parser.add_argument("--dir", default=assets.ASSET_DIR)
+    parser.add_argument("--check", action="store_true", help="exit 1 if the atlas is stale")
+    args = parser.parse_args(argv)
+    path = os.path.join(args.dir, ATLAS)
+    if args.check:
+        manifest = assets.read_manifest(args.dir)
+        keys = icons(manifest)
+        try:
+            atlas = Atlas.open(args.dir)
+        except FileNotFoundError:
+            atlas = None
+        if atlas is None or atlas.digest != source_digest(manifest, keys):
+            print(f"{path} is out of date; run atlas.py")
+            return 1
+        print(f"atlas up to date: {len(keys)} icons")
+        return 0
+    data = build(args.dir)
+    with open(path, "wb") as file:
+        file.write(data)
+    atlas = Atlas(data)
+    height, width = atlas.sheet.shape[:2]
+    print(f"packed {len(atlas.rects)} icons into {width}x{height} ({len(data) / 1e3:.1f} kB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
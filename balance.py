@@ -0,0 +1,247 @@
+"""Searching for stats and boss numbers that land the win rates we want.
+
+    python balance.py                                # default bands, every core
+    python balance.py --band water_bug=0.6:0.8 --run 0.1:0.2
+    python balance.py --flex 1:4 --hp 2 --hit 3 --top 10
+
+A candidate is a ``travis_stats`` vector plus a boss HP and hit
+threshold for each fight.  The fights share nothing but Travis' stats,
+so every (fight, HP, threshold, stats) combination is solved exactly
+once with ``odds.solve_spec``, spread over a ``ProcessPoolExecutor``,
+and the answers are kept in a JSON file under ~/.cache/swamp (or
+$SWAMP_BALANCE_CACHE).  The next search only solves what's new.
+
+The full run is the chance every fight goes Travis' way the first time,
+the same figure winnable.py prints for the shortest win.  Results are
+ranked by how little they change from what's in game.py today.
+"""
+import argparse
+import copy
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import game
+import odds
+
+FIGHTS = {
+    spec.name: spec
+    for spec in (game.LOT_LIZARD, game.METH_ZOMBIE, game.MOLE_CRICKET, game.WATER_BUG)
+}
+
+# stat bonuses Travis always has by the time he gets to a fight: the
+# fanny pack from the zombies is on before he ever reaches the springs
+BOOSTS = {"water_bug": {"flirt": 1}}
+
+# target win rates for each fight and for a clean run through all four
+BANDS = {
+    "lot_lizard": (0.60, 0.80),
+    "meth_zombie": (0.40, 0.60),
+    "mole_cricket": (0.55, 0.75),
+    "water_bug": (0.75, 0.90),
+}
+RUN_BAND = (0.10, 0.25)
+
+CACHE = os.environ.get("SWAMP_BALANCE_CACHE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "swamp", "balance.json"
+)
+
+# in-band options kept per fight when looking for a run in its band
+SHORTLIST = 4
+
+
+def variant(spec, boss_hp, hit):
+    """A copy of ``spec`` with a different boss HP and hit threshold."""
+    spec = copy.copy(spec)
+    spec.boss_hp = boss_hp
+    spec.hit = hit
+    return spec
+
+
+def fight_stats(name, stats):
+    stats = dict(zip(odds.MOVES, stats))
+    for move, bonus in BOOSTS.get(name, {}).items():
+        stats[move] += bonus
+    return stats
+
+
+def cache_key(name, boss_hp, hit, stats):
+    spec = variant(FIGHTS[name], boss_hp, hit)
+    numbers = ",".join(str(getattr(spec, field)) for field in odds.SPEC_FIELDS)
+    return f"{name}:{numbers}:{','.join(map(str, stats))}"
+
+
+def evaluate(job):
+    """``(fight, boss HP, hit, stats)`` -> exact win chance as a float."""
+    name, boss_hp, hit, stats = job
+    solution = odds.solve_spec(variant(FIGHTS[name], boss_hp, hit), fight_stats(name, stats))
+    return float(solution.win)
+
+
+def read_cache(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def write_cache(cache, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write then rename, so two searches can't leave a half-written file
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w") as file:
+        json.dump(cache, file, separators=(",", ":"), sort_keys=True)
+    os.replace(temp, path)
+
+
+def candidates(name, hp_spread, hit_spread):
+    """Every ``(boss HP, hit)`` within the spreads of ``name``'s current numbers."""
+    spec = FIGHTS[name]
+    for boss_hp in range(spec.boss_hp - hp_spread, spec.boss_hp + hp_spread + 1):
+        if boss_hp <= spec.defeated_at:
+            continue
+        for hit in range(spec.hit - hit_spread, spec.hit + hit_spread + 1):
+            # a threshold at or under the graze would leave no room for one
+            if hit > (spec.graze or 1):
+                yield boss_hp, hit
+
+
+def solve_all(jobs, cache, workers=None):
+    """Fill ``cache`` in for every job it doesn't have yet; returns how many."""
+    keys = [cache_key(*job) for job in jobs]
+    todo = [(key, job) for key, job in zip(keys, jobs) if key not in cache]
+    if not todo:
+        return 0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        chunk = max(1, len(todo) // (4 * workers))
+        wins = pool.map(evaluate, [job for _, job in todo], chunksize=chunk)
+        for (key, _), win in zip(todo, wins):
+            cache[key] = win
+    return len(todo)
+
+
+def change(name, boss_hp, hit):
+    spec = FIGHTS[name]
+    return abs(boss_hp - spec.boss_hp) + abs(hit - spec.hit)
+
+
+def best_run(options, run_band):
+    """Pick one option per fight so the whole run lands in ``run_band``.
+
+    ``options`` maps each fight to ``[(change, boss HP, hit, win)]``,
+    smallest change first.  Returns the cheapest pick as
+    ``(change, {fight: option}, run)``, or None.
+    """
+    best = None
+    names = list(options)
+    for picks in itertools.product(*(options[name][:SHORTLIST] for name in names)):
+        run = 1.0
+        for pick in picks:
+            run *= pick[3]
+        if not run_band[0] <= run <= run_band[1]:
+            continue
+        cost = sum(pick[0] for pick in picks)
+        if best is None or cost < best[0]:
+            best = (cost, dict(zip(names, picks)), run)
+    return best
+
+
+def search(stat_ranges, hp_spread, hit_spread, bands, run_band, cache, workers=None):
+    """Every stat vector that can meet the bands, cheapest change first.
+
+    Returns ``(results, solved)``: results are ``(change, stats, picks,
+    run)`` and ``solved`` is how many fights had to be solved fresh.
+    """
+    vectors = list(itertools.product(*stat_ranges))
+    grid = {name: list(candidates(name, hp_spread, hit_spread)) for name in bands}
+    jobs = [
+        (name, boss_hp, hit, stats)
+        for stats in vectors
+        for name, numbers in grid.items()
+        for boss_hp, hit in numbers
+    ]
+    solved = solve_all(jobs, cache, workers)
+
+    current = tuple(odds.DEFAULT_STATS[move] for move in odds.MOVES)
+    results = []
+    for stats in vectors:
+        options = {}
+        for name, (low, high) in bands.items():
+            fits = options[name] = []
+            for boss_hp, hit in grid[name]:
+                win = cache[cache_key(name, boss_hp, hit, stats)]
+                if low <= win <= high:
+                    fits.append((change(name, boss_hp, hit), boss_hp, hit, win))
+            if not fits:
+                break
+            fits.sort()
+        else:
+            run = best_run(options, run_band)
+            if run:
+                cost, picks, chance = run
+                cost += sum(abs(a - b) for a, b in zip(stats, current))
+                results.append((cost, stats, picks, chance))
+    results.sort(key=lambda result: result[:2])
+    return results, solved
+
+
+def _range(text):
+    low, _, high = text.partition(":")
+    return range(int(low), int(high or low) + 1)
+
+
+def _band(text):
+    low, _, high = text.partition(":")
+    return float(low), float(high)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search stats and boss numbers for target win rates.")
+    for move in odds.MOVES:
+        parser.add_argument(f"--{move}", type=_range, default=range(0, 6), metavar="LO:HI")
+    parser.add_argument("--hp", type=int, default=1, help="vary each boss' HP by up to this much")
+    parser.add_argument("--hit", type=int, default=2, help="vary each hit threshold by up to this much")
+    parser.add_argument("--band", action="append", default=[], metavar="FIGHT=LO:HI")
+    parser.add_argument("--run", type=_band, default=RUN_BAND, metavar="LO:HI")
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--jobs", type=int, help="worker processes (default: every core)")
+    parser.add_argument("--no-cache", action="store_true", help="solve everything from scratch")
+    args = parser.parse_args(argv)
+
+    bands = dict(BANDS)
+    for band in args.band:
+        name, _, limits = band.partition("=")
+        if name not in bands:
+            parser.error(f"unknown fight {name!r}")
+        bands[name] = _band(limits)
+
+    cache = {} if args.no_cache else read_cache(CACHE)
+    began = time.perf_counter()
+    results, solved = search(
+        [getattr(args, move) for move in odds.MOVES],
+        args.hp, args.hit, bands, args.run, cache, args.jobs,
+    )
+    elapsed = time.perf_counter() - began
+    if solved and not args.no_cache:
+        write_cache(cache, CACHE)
+    print(f"solved {solved} fights ({len(cache)} known) in {elapsed:.2f}s")
+
+    if not results:
+        print("nothing in range meets every band")
+        return 1
+    print(f"{len(results)} stat vectors meet every band; the closest to today's numbers:")
+    for cost, stats, picks, run in results[:args.top]:
+        shown = " ".join(f"{move} {value}" for move, value in zip(odds.MOVES, stats))
+        print(f"\n{shown}   full run {run:.2%}   change {cost}")
+        for name, (_, boss_hp, hit, win) in picks.items():
+            print(f"    {name:<13} hp {boss_hp}  hit {hit:>2}   win {win:.2%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
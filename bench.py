@@ -0,0 +1,582 @@
+"""Performance checks for the swamp.
+
+    python bench.py startup      # import-time report, fails over budget
+    python bench.py session      # bytes and microseconds per new session
+    python bench.py checks       # cost of inventory and flag checks
+    python bench.py snapshot     # save/restore cost, single and bulk
+    python bench.py dispatch     # Scene.perform_action, exact and abbreviated
+    python bench.py move         # GameState.move_to with plain and interactive hooks
+    python bench.py fight        # one fight turn, silent and with its text
+    python bench.py playthrough  # whole games from the trailer to the ending
+    python bench.py world        # compiling the data files vs loading the image
+    python bench.py reload       # moving live sessions into a freshly built world
+    python bench.py journal      # what logging every change costs a turn, and recovery
+    python bench.py winnable     # the winnability solver, end to end
+
+    python bench.py --json HEAD.json                       # keep the numbers
+    python bench.py --json new.json --compare HEAD.json    # ... and check them
+
+Each benchmark prints a short report and returns False when it blows
+its budget, so the script's exit code can gate a CI run.  It also puts
+its headline numbers into a dict; ``--json`` saves them with the commit
+they were measured on and ``--compare`` fails when any of them got more
+than ``--tolerance`` worse than in an earlier file.  Every number is a
+cost, so lower is always better.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+# cumulative ``-X importtime`` microseconds allowed for each library import
+STARTUP_BUDGET_US = {
+    "game": 10_000,
+}
+
+
+def _python(code, *flags):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_times(module):
+    """Import ``module`` in a fresh interpreter and parse ``-X importtime``.
+
+    Returns ``(rows, stdout)`` where rows are ``(self_us, cumulative_us,
+    name)`` tuples for every module the import pulled in.
+    """
+    # whatever the interpreter loads on its own isn't the module's fault
+    baseline = {
+        line.rsplit("|", 1)[1].strip()
+        for line in _python("pass", "-X", "importtime").stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    }
+    proc = _python(f"import {module}", "-X", "importtime")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit() or name.strip() in baseline:
+            continue
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows, proc.stdout
+
+
+def _wall(code, runs):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        _python(code)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_startup(results, runs=5):
+    """Check that library imports stay silent and inside their budget."""
+    ok = True
+    # a warm-up import so a stale .pyc doesn't get counted as import time
+    for module in STARTUP_BUDGET_US:
+        _python(f"import {module}")
+    interpreter = _wall("pass", runs)
+    print(f"bare interpreter start: {interpreter * 1e3:7.1f} ms")
+    for module, budget in STARTUP_BUDGET_US.items():
+        best = None
+        for _ in range(runs):
+            rows, stdout = import_times(module)
+            total = next(cumulative for _, cumulative, name in rows if name == module)
+            if best is None or total < best[0]:
+                best = (total, rows, stdout)
+        total, rows, stdout = best
+        wall = _wall(f"import {module}", runs)
+        verdict = "ok" if total <= budget else "OVER BUDGET"
+        results[f"import_{module}_us"] = total
+        results[f"start_{module}_ms"] = wall * 1e3
+        print(
+            f"import {module:<8} {total / 1e3:7.2f} ms of {budget / 1e3:.2f} ms budget, "
+            f"cold start {wall * 1e3:.1f} ms ({(wall - interpreter) * 1e3:+.1f} ms)  {verdict}"
+        )
+        for self_us, cumulative_us, name in sorted(rows, reverse=True)[:5]:
+            print(f"    {self_us / 1e3:7.2f} ms self {cumulative_us / 1e3:7.2f} ms total  {name}")
+        if stdout:
+            print(f"    importing {module} printed {len(stdout)} characters")
+            ok = False
+        ok = ok and total <= budget
+    return ok
+
+
+def session_bytes(make, count=10_000):
+    """Average bytes ``tracemalloc`` sees allocated per ``make()`` call."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        keep = [make() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del keep
+    return (after - before) / count
+
+
+def _per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+class LegacyState:
+    """The old dict-and-list GameState layout, kept as a yardstick."""
+
+    def __init__(self, scenes, start):
+        self.scenes = scenes
+        self.current_scene = scenes[start]
+        self.say = print
+        self.pending = []
+        self.finished = False
+        self.inventory = [
+            "Half-empty flask of 'shine",
+            "Bag of gator jerky",
+            "Rubber duck floaty",
+            "Cheetah-print fanny pack",
+            "Slim Jim coupon",
+            "Zippo lighter with a naked lady on it",
+        ]
+        self.flags = {"travis_stats": {"flex": 2, "flirt": 3, "yeehaw": 1}}
+        self.flags["beat_mole_cricket"] = True
+
+
+def bench_session(results, count=10_000):
+    """Measure what one more player costs once the world is built."""
+    import game
+
+    scenes = game.get_scenes()
+
+    def make():
+        return game.GameState(scenes, "trailer", say=None)
+
+    print(f"{'':18}{'before':>10}{'after':>10}")
+    before = session_bytes(lambda: LegacyState(scenes, "trailer"), count)
+    after = results["session_bytes"] = session_bytes(make, count)
+    print(f"{'session size':18}{before:>8.0f} B{after:>8.0f} B")
+    before = _per_call(lambda: LegacyState(scenes, "trailer"), count)
+    after = _per_call(make, count)
+    results["session_create_us"] = after * 1e6
+    print(f"{'session creation':18}{before * 1e6:>7.2f} us{after * 1e6:>7.2f} us")
+    return True
+
+
+def bench_checks(results, number=200_000):
+    """Compare the requirement checks the scenes and fights make."""
+    import game
+
+    scenes = game.get_scenes()
+    old = LegacyState(scenes, "trailer")
+    new = game.GameState(scenes, "trailer", say=None)
+    for item in (game.DUCK_FLOATY, game.FANNY_PACK, game.SLIM_JIM_COUPON, game.ZIPPO):
+        new.add_item(item)
+    new.set_flag(game.BEAT_MOLE_CRICKET)
+    required = ["Rubber duck floaty", "Cheetah-print fanny pack", "Slim Jim coupon"]
+    checks = [
+        (
+            "has jerky",
+            lambda: "Bag of gator jerky" in old.inventory,
+            lambda: new.items[game.GATOR_JERKY],
+        ),
+        (
+            "has a lighter",
+            lambda: any("Zippo lighter" in item for item in old.inventory),
+            lambda: new.items[game.ZIPPO],
+        ),
+        (
+            "water bug kit",
+            lambda: all(item in old.inventory for item in required),
+            lambda: all(map(new.items.__getitem__, game.WATER_BUG.requires)),
+        ),
+        (
+            "flag check",
+            lambda: old.flags.get("beat_mole_cricket"),
+            lambda: new.flags & game.BEAT_MOLE_CRICKET,
+        ),
+    ]
+    print(f"{'':18}{'before':>10}{'after':>10}")
+    for name, before, after in checks:
+        after = results[f"check_{name.replace(' ', '_')}_ns"] = _per_call(after, number) * 1e9
+        print(f"{name:18}{_per_call(before, number) * 1e9:>7.0f} ns{after:>7.0f} ns")
+    return True
+
+
+def bench_snapshot(results, number=100_000, sessions=100_000):
+    """Time single snapshots and a bulk save and load of many sessions."""
+    import os
+    import tempfile
+
+    import game
+    import snapshot
+
+    state = game.GameState(game.get_scenes(), "trailer", say=None)
+    data = snapshot.dump(state)
+    print(f"record size       {len(data):>7} B")
+    results["snapshot_dump_ns"] = _per_call(lambda: snapshot.dump(state), number) * 1e9
+    results["snapshot_load_ns"] = _per_call(lambda: snapshot.load(data), number) * 1e9
+    print(f"dump              {results['snapshot_dump_ns']:>7.0f} ns")
+    print(f"load              {results['snapshot_load_ns']:>7.0f} ns")
+    states = [state] * sessions
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.sav")
+        start = time.perf_counter()
+        snapshot.dump_many(states, path)
+        dumped = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = snapshot.load_many(path)
+        restored = time.perf_counter() - start
+        size = os.path.getsize(path)
+    results["dump_many_ms"] = dumped * 1e3
+    results["load_many_ms"] = restored * 1e3
+    print(f"dump_many {sessions:>7}  {dumped * 1e3:>7.1f} ms  {size / 1e6:.1f} MB")
+    print(f"load_many {len(loaded):>7}  {restored * 1e3:>7.1f} ms")
+    return True
+
+
+def _quiet(text):
+    pass
+
+
+def bench_dispatch(results, number=200_000):
+    """Time ``Scene.perform_action`` on a command typed out and abbreviated."""
+    import game
+
+    state = game.GameState(game.get_scenes(), "trailer", say=_quiet)
+    trailer = state.current_scene
+    for name, command, resolves in (
+        ("exact", "look in fridge", True),
+        ("prefix", "look fr", True),
+        ("unknown", "dance", False),
+    ):
+        # make sure each case times the path it's named after
+        if trailer.perform_action(command, state)[0] != resolves:
+            print(f"{command!r} {'should' if resolves else 'should not'} resolve in the trailer")
+            return False
+        per_call = results[f"dispatch_{name}_ns"] = _per_call(
+            lambda: trailer.perform_action(command, state), number
+        ) * 1e9
+        print(f"{name:18}{per_call:>7.0f} ns  {command!r}")
+    return True
+
+
+def bench_move(results, number=200_000):
+    """Time ``GameState.move_to`` through each kind of enter hook."""
+    import game
+
+    state = game.GameState(game.get_scenes(), "trailer", say=_quiet)
+
+    def interactive():
+        state.move_to("stage_backroom")
+        state.pending = None
+
+    moves = (
+        ("no hook", lambda: state.move_to("cop_chase")),
+        ("plain hook", lambda: state.move_to("gas_station")),
+        ("interactive hook", interactive),
+    )
+    for name, move in moves:
+        per_call = results[f"move_{name.replace(' ', '_')}_ns"] = _per_call(move, number) * 1e9
+        print(f"{name:18}{per_call:>7.0f} ns")
+    return True
+
+
+def bench_fight(results, fights=2_000):
+    """Time one fight turn, averaged over whole fights, with and without text."""
+    import combat
+    import game
+    from rng import SessionRng
+
+    # the stats Travis has at the springs, fanny pack on
+    stats = {"flex": 2, "flirt": 4, "yeehaw": 1}
+
+    def moves(prompt):
+        return "flirt"
+
+    lines = []
+    for label, say in (("silent", None), ("with text", lines.append)):
+        turns = 0
+        start = time.perf_counter()
+        for seed in range(fights):
+            outcome = combat.run(game.WATER_BUG, stats, moves, SessionRng(seed), say)
+            turns += outcome.turns
+            lines.clear()
+        per_turn = results[f"fight_turn_{label.replace(' ', '_')}_us"] = (
+            (time.perf_counter() - start) / turns * 1e6
+        )
+        print(f"{label:18}{per_turn:>7.2f} us per turn  ({turns / fights:.1f} turns per fight)")
+    return True
+
+
+def scripted_player(state):
+    """An ``ask`` that plays the game straight through to the ending.
+
+    It follows ``bots.ROUTE``, flirts in every fight and sings the
+    karaoke back word for word.  Lost fights send Travis back around the
+    loop.
+    """
+    import game
+    from bots import ROUTE
+
+    def ask(prompt):
+        if prompt == game.MENU_PROMPT:
+            scene = state.current_scene.name
+            if scene == "dirt_road":
+                return "go to gas station" if state.flags & game.CHECKED_TRUCK else "check truck"
+            return ROUTE[scene]
+        if prompt.strip() == ">":
+            return "flirt"
+        return prompt.strip()
+
+    return ask
+
+
+def bench_playthrough(results, games=200):
+    """Time whole scripted games, from a new session to the end."""
+    import game
+    from output import TurnBuffer
+
+    scenes = game.get_scenes()
+    sink = []
+    turns = 0
+    start = time.perf_counter()
+    for seed in range(games):
+        out = TurnBuffer(sink.append)
+        state = game.GameState(scenes, "trailer", say=out.say, seed=seed)
+        player = scripted_player(state)
+
+        def ask(prompt):
+            out.flush(prompt)
+            return player(prompt)
+
+        game.drive(game.play_session(state), ask)
+        if not state.finished:
+            print(f"seed {seed}: the scripted player never reached the ending")
+            return False
+        turns += len(sink)
+        sink.clear()
+    elapsed = time.perf_counter() - start
+    results["playthrough_us"] = elapsed / games * 1e6
+    results["playthrough_turn_us"] = elapsed / turns * 1e6
+    print(f"whole game        {elapsed / games * 1e6:>7.0f} us  ({turns / games:.1f} prompts per game)")
+    print(f"per prompt        {elapsed / turns * 1e6:>7.2f} us")
+    return True
+
+
+def bench_journal(results, games=200):
+    """Time scripted games with and without a journal, and recovering from one."""
+    import os
+    import tempfile
+
+    import game
+    import journal
+
+    scenes = game.get_scenes()
+
+    def play(journals):
+        turns = 0
+        start = time.perf_counter()
+        for seed in range(games):
+            state = game.GameState(scenes, "trailer", say=_quiet, seed=seed)
+            if journals:
+                log = state.journal = journals.open(str(seed))
+            player = scripted_player(state)
+
+            def ask(prompt):
+                nonlocal turns
+                turns += 1
+                if journals and prompt == game.MENU_PROMPT:
+                    log.commit(state)
+                return player(prompt)
+
+            game.drive(game.play_session(state), ask)
+            if journals:
+                # what the server's interval flush and the session's end do
+                journals.flush()
+                journals.close(log)
+        return (time.perf_counter() - start) / turns
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journals = journal.Journals(tmp)
+        bare = play(None)
+        logged = play(journals)
+        # the longest replay a recovery can have: a checkpoint and then
+        # events right up to the compaction threshold
+        state = game.GameState(scenes, "trailer", say=_quiet, seed=0)
+        log = state.journal = journals.open("worst")
+        log.commit(state)
+        turn = b"".join(
+            journal.EVENT.pack(kind, 0, 0) for kind in (journal.ADD_ITEM, journal.REMOVE_ITEM, journal.TURN)
+        )
+        with open(log.path, "ab") as file:
+            file.write(turn * ((journal.COMPACT_BYTES - 1) // len(turn)))
+        size = os.path.getsize(log.path)
+        recover = min(timeit.repeat(lambda: journal.recover(log.path), number=1, repeat=50))
+    results["journal_turn_us"] = (logged - bare) * 1e6
+    results["journal_recover_us"] = recover * 1e6
+    print(f"per prompt        {bare * 1e6:>7.2f} us bare, {logged * 1e6:.2f} us logged")
+    print(f"logging           {results['journal_turn_us']:>7.2f} us per prompt")
+    print(f"worst recovery    {recover * 1e6:>7.0f} us  ({size} B log)")
+    return True
+
+
+def bench_world(results, runs=20):
+    """Time building the world from its TOML and from the cached image."""
+    import os
+    import tempfile
+
+    import world
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=runs))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "world.bin")
+        compiled, _ = world.image(path=path)
+        results["world_compile_ms"] = best(world.compile_world) * 1e3
+        results["world_image_ms"] = best(lambda: world.image(path=path)) * 1e3
+        results["world_build_ms"] = best(lambda: world.World(compiled)) * 1e3
+        size = os.path.getsize(path)
+    print(f"compile from TOML  {results['world_compile_ms']:>7.2f} ms")
+    print(f"map image          {results['world_image_ms']:>7.2f} ms  ({size / 1e3:.1f} kB)")
+    print(f"build scenes       {results['world_build_ms']:>7.2f} ms")
+    return True
+
+
+def bench_reload(results, sessions=10_000):
+    """Time a reload's build and moving sessions into the new world."""
+    import game
+    import world
+
+    compiled, digest = world.image()
+    began = time.perf_counter()
+    old = world.World(compiled, digest)
+    new = world.World(compiled, digest)
+    results["reload_build_ms"] = (time.perf_counter() - began) / 2 * 1e3
+    game.install(old)
+    states = []
+    for seed in range(sessions):
+        state = game.GameState(old.scenes, "trailer", say=_quiet, seed=seed)
+        state.add_item(game.ZIPPO)
+        state.set_flag(game.BEAT_LIZARD)
+        states.append(state)
+    began = time.perf_counter()
+    for state in states:
+        world.remap(state, old, new)
+    results["reload_move_us"] = (time.perf_counter() - began) / sessions * 1e6
+    moved = sum(state.scenes is new.scenes for state in states)
+    print(f"build world        {results['reload_build_ms']:>7.2f} ms")
+    print(f"move one session   {results['reload_move_us']:>7.2f} us  ({moved}/{sessions} moved)")
+    return moved == sessions
+
+
+def bench_winnable(results):
+    """Run the winnability solver, and then its command line, to the shortest win."""
+    import winnable
+
+    began = time.perf_counter()
+    report = winnable.solve()
+    results["winnable_solve_ms"] = (time.perf_counter() - began) * 1e3
+    moves = sum(map(len, report.edges.values()))
+    print(f"solve              {results['winnable_solve_ms']:>7.1f} ms  ({len(report.edges)} states, {moves} moves)")
+    if not report.winnable:
+        print("the ending can't be reached")
+        return False
+    print(f"shortest win       {len(report.route):>7}    commands  ({float(report.route_chance):.2%} chance)")
+    # the report as well: it restores and describes every state it found
+    run = subprocess.run(
+        [sys.executable, "-c", "import sys, winnable; sys.exit(winnable.main(['--dead', '1']))"],
+        capture_output=True,
+        text=True,
+    )
+    if run.returncode:
+        print(f"winnable.py exited {run.returncode}:\n{run.stdout}{run.stderr}")
+        return False
+    return True
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "session": bench_session,
+    "checks": bench_checks,
+    "snapshot": bench_snapshot,
+    "dispatch": bench_dispatch,
+    "move": bench_move,
+    "fight": bench_fight,
+    "playthrough": bench_playthrough,
+    "world": bench_world,
+    "reload": bench_reload,
+    "journal": bench_journal,
+    "winnable": bench_winnable,
+}
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results, baseline, tolerance):
+    """``(benchmark, metric, before, after)`` for every number that got worse."""
+    worse = []
+    for name, metrics in results.items():
+        for metric, after in metrics.items():
+            before = baseline.get(name, {}).get(metric)
+            if before and after > before * (1 + tolerance):
+                worse.append((name, metric, before, after))
+    return worse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the swamp's performance checks.")
+    parser.add_argument("names", nargs="*", metavar="name", help=", ".join(BENCHMARKS))
+    parser.add_argument("--json", metavar="PATH", help="save the results here")
+    parser.add_argument("--compare", metavar="PATH", help="fail on regressions against this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="how much worse counts (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+    ok = True
+    results = {}
+    for name in args.names or BENCHMARKS:
+        print(f"== {name} ==")
+        results[name] = {}
+        ok = BENCHMARKS[name](results[name]) and ok
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({
+                "commit": _commit(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, file, indent=2, sort_keys=True)
+            file.write("\n")
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        worse = regressions(results, baseline["results"], args.tolerance)
+        print(f"== against {baseline.get('commit') or args.compare} ==")
+        for name, metric, before, after in worse:
+            print(f"{name}.{metric}: {before:.4g} -> {after:.4g} ({after / before - 1:+.0%})")
+        if not worse:
+            print(f"nothing more than {args.tolerance:.0%} worse")
+        ok = ok and not worse
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
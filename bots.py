@@ -0,0 +1,211 @@
+"""Scripted players that read the game's output and type like people do.
+
+A bot sees exactly what a human would: the text of a turn, ending in a
+prompt.  ``read_screen`` picks out the scene banner, the menu's choices
+and the prompt, and a persona decides what to type back and how long to
+think about it first.
+
+- ``Speedrunner`` knows the way to Ginnie Springs and takes it, flirting
+  through every fight.
+- ``Wanderer`` picks whatever's on the menu, checks its pockets, makes
+  typos, fluffs the karaoke now and then, and wanders off eventually.
+- ``FightSpammer`` goes looking for fights, hammers in moves as fast as
+  it can, and goes back to the Lot Lizard for another round.
+
+Think times are log-normal around each persona's median, which is what
+human response times look like: mostly quick, with a long tail.
+"""
+import math
+import random
+import re
+
+from game import MENU_PROMPT
+
+# what the speedrunner types in each scene on the way to the ending
+ROUTE = {
+    "trailer": "step outside",
+    "gas_station": "approach snacks",
+    "gas_station_after_lizard": "go to mud hole",
+    "mud_hole": "approach tent",
+    "walmart": "fight zombies",
+    "walmart_after_zombies": "go to springs",
+    "cop_chase": "keep running",
+    "strip_club": "approach stage",
+    "stage_backroom": "leave",
+    "club_exit": "go to ginnie springs",
+    "ginnie_springs": "fight",
+}
+
+FIGHTS = frozenset(("approach snacks", "approach tent", "fight zombies", "fight"))
+MOVES = ("flex", "flirt", "yeehaw")
+
+# kinds of prompt
+MENU = "menu"
+FIGHT = "fight"
+STARE = "stare"
+SONG = "song"
+
+_BANNER = re.compile(r"=== (.+?) ===")
+
+
+class Screen:
+    """One turn's output, picked apart."""
+
+    __slots__ = ("scene", "choices", "prompt", "kind")
+
+    def __init__(self, scene, choices, prompt, kind):
+        self.scene = scene
+        self.choices = choices
+        self.prompt = prompt
+        self.kind = kind
+
+
+def prompt_kind(prompt):
+    """What kind of prompt ``prompt`` is, or None if it isn't one yet."""
+    if prompt == MENU_PROMPT:
+        return MENU
+    if prompt.strip() == ">":
+        return FIGHT
+    if prompt == "Your move? ":
+        return STARE
+    if prompt.endswith(" ") and prompt.strip().isupper():
+        return SONG
+    return None
+
+
+def read_screen(text, scene=None):
+    """Split a turn's text into a ``Screen``; None if no prompt ends it.
+
+    ``scene`` is the last scene seen, for turns (like a fight's) that
+    don't print the banner again.
+    """
+    head, _, prompt = text.rpartition("\n")
+    kind = prompt_kind(prompt)
+    if kind is None:
+        return None
+    banners = _BANNER.findall(head)
+    if banners:
+        scene = banners[-1].lower()
+    choices = ()
+    if kind == MENU:
+        _, _, menu = head.rpartition("What now? You can:")
+        choices = tuple(line[2:] for line in menu.splitlines() if line.startswith("- "))
+    return Screen(scene, choices, prompt, kind)
+
+
+class Bot:
+    """A persona: what it types, and how long it thinks before typing."""
+
+    name = "bot"
+    # median seconds before answering a menu and a fight prompt
+    menu_think = 2.0
+    fight_think = 0.5
+    # spread of the log-normal think times
+    sigma = 0.6
+    # gives up after a number of turns somewhere in this range
+    patience = (10_000, 10_000)
+    # terminal widths to pick from, announced with "width N" first thing
+    widths = (None,)
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+        self.memory = set()
+        self.turns = 0
+        self.quit_after = self.rng.randint(*self.patience)
+        self.width = self.rng.choice(self.widths)
+
+    def think(self, screen, scale=1.0):
+        median = self.menu_think if screen.kind == MENU else self.fight_think
+        return median * scale * math.exp(self.rng.gauss(0, self.sigma))
+
+    def reply(self, screen):
+        """The line to type at ``screen``, or None to hang up."""
+        self.turns += 1
+        if self.turns > self.quit_after:
+            return "quit" if screen.kind == MENU else None
+        if screen.kind == MENU:
+            if self.width:
+                width, self.width = self.width, None
+                return f"width {width}"
+            return self.command(screen)
+        if screen.kind == FIGHT:
+            return self.move()
+        if screen.kind == STARE:
+            return "flex lat spread"
+        return self.sing(screen.prompt.strip())
+
+    def route(self, scene):
+        if scene == "dirt_road":
+            if "checked truck" in self.memory:
+                return "go to gas station"
+            self.memory.add("checked truck")
+            return "check truck"
+        return ROUTE.get(scene, "leave")
+
+    def command(self, screen):
+        return self.route(screen.scene)
+
+    def move(self):
+        return "flirt"
+
+    def sing(self, line):
+        return line
+
+
+class Speedrunner(Bot):
+    name = "speedrunner"
+    menu_think = 0.8
+    fight_think = 0.3
+
+
+class Wanderer(Bot):
+    name = "wanderer"
+    menu_think = 4.0
+    fight_think = 1.5
+    sigma = 0.8
+    patience = (20, 120)
+    widths = (None, 40, 60, 80, 80, 100, 120)
+
+    def command(self, screen):
+        roll = self.rng.random()
+        if roll < 0.1 or not screen.choices:
+            return "inventory"
+        choice = self.rng.choice(screen.choices)
+        if roll < 0.15 and len(choice) > 4:
+            # fat fingers: drop a letter
+            cut = self.rng.randrange(len(choice))
+            choice = choice[:cut] + choice[cut + 1:]
+        if "check truck" in choice:
+            self.memory.add("checked truck")
+        return choice
+
+    def move(self):
+        if self.rng.random() < 0.05:
+            return "run away"
+        return self.rng.choice(MOVES)
+
+    def sing(self, line):
+        return line if self.rng.random() < 0.8 else "la la la"
+
+
+class FightSpammer(Bot):
+    name = "fight_spammer"
+    menu_think = 1.0
+    fight_think = 0.15
+    sigma = 0.4
+    patience = (60, 300)
+
+    def command(self, screen):
+        for choice in screen.choices:
+            if choice in FIGHTS:
+                return choice
+        if screen.scene == "gas_station_after_lizard" and self.rng.random() < 0.5:
+            # back out and come in again for another go at the Lot Lizard
+            return "leave"
+        return self.route(screen.scene)
+
+    def move(self):
+        return self.rng.choice(MOVES)
+
+
+PERSONAS = {bot.name: bot for bot in (Speedrunner, Wanderer, FightSpammer)}
@@ -0,0 +1,231 @@
+"""One combat engine for every d20 boss fight.
+
+Each boss is a ``BossSpec`` record: HP, waves, thresholds, what a miss
+does to Travis, the flavor lines and what happens when he wins or loses.
+The engine itself never touches a terminal.  ``fight`` is a generator
+that yields a prompt whenever it needs a move and is sent the reply, so
+the same fight can be driven by ``input()``, by a network session, by a
+script, or by a policy function in a tight loop with ``say=None`` and no
+output at all.
+"""
+import random
+from collections import namedtuple
+
+MOVES = ("flex", "flirt", "yeehaw")
+
+MOVE_MENU = ("- flex (STR)", "- flirt (CHA)", "- yeehaw (WTF)")
+
+# what a roll below the graze (or hit) threshold does to Travis
+HURT = "hurt"    # he loses 1 HP
+BOG = "bog"      # he loses his next turn and 1 HP with it
+TWERK = "twerk"  # coin flip: lose 1 HP, or his next move is a random one
+
+Outcome = namedtuple("Outcome", "won hp turns")
+
+
+class BossSpec:
+    """Everything that makes one boss fight different from the others."""
+
+    def __init__(
+        self,
+        name,
+        *,
+        boss_hp,
+        hit,
+        travis_hp=3,
+        waves=1,
+        defeated_at=0,
+        graze=None,
+        on_miss=HURT,
+        intro=(),
+        menu="\nWhat's your move?",
+        prompt="> ",
+        invalid="That ain't a move.",
+        wave_intro=None,
+        wave_clear=None,
+        move_lines=None,
+        hit_lines=(),
+        graze_lines=(),
+        miss_lines=(),
+        twerk_lines=(),
+        bogged_lines=(),
+        confused_line=None,
+        requires=(),
+        unready_lines=(),
+        unready_scene=None,
+        win_lines=(),
+        loot=(),
+        win_flag=None,
+        win_scene=None,
+        lose_lines=(),
+        consolation=None,
+        lose_scene=None,
+    ):
+        self.name = name
+        self.boss_hp = boss_hp
+        self.hit = hit
+        self.travis_hp = travis_hp
+        self.waves = waves
+        # the fight is over once the boss is down to this much HP
+        self.defeated_at = defeated_at
+        self.graze = graze
+        self.on_miss = on_miss
+        self.intro = intro
+        self.menu = menu
+        # the question and the move list, rendered once for every turn
+        self.move_menu = "\n".join((menu, *MOVE_MENU))
+        self.prompt = prompt
+        self.invalid = invalid
+        self.wave_intro = wave_intro
+        self.wave_clear = wave_clear
+        self.move_lines = move_lines or {}
+        self.hit_lines = hit_lines
+        self.graze_lines = graze_lines
+        self.miss_lines = miss_lines
+        self.twerk_lines = twerk_lines
+        # printed before and after the lost turn when Travis is bogged
+        self.bogged_lines = bogged_lines
+        self.confused_line = confused_line
+        self.requires = requires
+        self.unready_lines = unready_lines
+        self.unready_scene = unready_scene
+        self.win_lines = win_lines
+        self.loot = loot
+        self.win_flag = win_flag
+        self.win_scene = win_scene
+        self.lose_lines = lose_lines
+        # (item, flag, line) handed out once after a loss
+        self.consolation = consolation
+        self.lose_scene = lose_scene
+
+    def __repr__(self):
+        return f"BossSpec({self.name!r})"
+
+
+def _say_flavor(say, lines, rng):
+    # a spec doesn't have to have a table for every kind of exchange
+    if lines:
+        say(lines[0] if len(lines) == 1 else rng.choice(lines))
+
+
+def fight(spec, stats, rng=random, say=None):
+    """Run one fight as a generator.
+
+    Yields ``spec.prompt`` each time Travis needs to pick a move and
+    expects the reply to be sent back.  Returns an ``Outcome`` through
+    ``StopIteration``.  ``say`` gets every line of output; leave it as
+    ``None`` to skip building the text altogether, flavor lines and the
+    dice spent picking them included.
+    """
+    hp = spec.travis_hp
+    turns = 0
+    bogged = confused = False
+    for wave in range(1, spec.waves + 1):
+        boss = spec.boss_hp
+        if say and spec.wave_intro:
+            say(spec.wave_intro.format(wave=wave))
+        while boss > spec.defeated_at and hp > 0:
+            if bogged:
+                turns += 1
+                bogged = False
+                hp -= 1
+                if say:
+                    for line in spec.bogged_lines:
+                        say(line)
+                continue
+            if confused:
+                move = rng.choice(MOVES)
+                confused = False
+                if say and spec.confused_line:
+                    say(spec.confused_line.format(move=move))
+            else:
+                if say:
+                    say(spec.move_menu)
+                move = (yield spec.prompt).strip().lower()
+                if move not in MOVES:
+                    if say:
+                        say(spec.invalid)
+                    continue
+            turns += 1
+            if say and move in spec.move_lines:
+                _say_flavor(say, spec.move_lines[move], rng)
+
+            roll = rng.randint(1, 20)
+            mod = stats.get(move, 0)
+            total = roll + mod
+            if say:
+                say(f"You rolled a {roll} + {mod} = {total}!")
+
+            if total >= spec.hit:
+                boss -= 1
+                lines = spec.hit_lines
+            elif spec.graze is not None and total >= spec.graze:
+                lines = spec.graze_lines
+            elif spec.on_miss == BOG:
+                bogged = True
+                lines = spec.miss_lines
+            elif spec.on_miss == TWERK and rng.random() < 0.5:
+                confused = True
+                lines = spec.twerk_lines
+            else:
+                hp -= 1
+                lines = spec.miss_lines
+            if say:
+                _say_flavor(say, lines, rng)
+
+        if hp <= 0:
+            return Outcome(False, hp, turns)
+        if say and spec.wave_clear:
+            say(spec.wave_clear)
+    return Outcome(True, hp, turns)
+
+
+def run(spec, stats, moves, rng=random, say=None):
+    """Drive a fight to the end, asking ``moves(prompt)`` for every move."""
+    turns = fight(spec, stats, rng, say)
+    try:
+        prompt = next(turns)
+        while True:
+            prompt = turns.send(moves(prompt))
+    except StopIteration as done:
+        return done.value
+
+
+def settle(spec, state, outcome, say):
+    """Hand out loot or consolation and move Travis to the next scene."""
+    if outcome.won:
+        for line in spec.win_lines:
+            say(line)
+        for item in spec.loot:
+            state.add_item(item)
+        if spec.win_flag:
+            state.set_flag(spec.win_flag)
+        state.move_to(spec.win_scene)
+        return
+    for line in spec.lose_lines:
+        say(line)
+    if spec.consolation:
+        item, flag, line = spec.consolation
+        if not state.flags & flag:
+            say(line)
+            state.add_item(item)
+            state.set_flag(flag)
+    state.move_to(spec.lose_scene)
+
+
+def play(spec, state):
+    """Play a boss fight against ``state``.
+
+    A generator like ``fight``: it yields every move prompt, all output
+    goes to ``state.say`` and the dice come from ``state.rng``.
+    """
+    say = state.say
+    if not all(map(state.items.__getitem__, spec.requires)):
+        for line in spec.unready_lines:
+            say(line)
+        state.move_to(spec.unready_scene)
+        return
+    for line in spec.intro:
+        say(line)
+    outcome = yield from fight(spec, state.stats(), state.rng, say)
+    settle(spec, state, outcome, say)
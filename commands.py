@@ -0,0 +1,203 @@
+"""Turning what a player types into one of a scene's commands.
+
+Each scene compiles its choices into a ``CommandIndex`` once, when the
+world is built.  Lookup normalizes the input (case, curly quotes,
+punctuation, filler words like "in" and "the", a few word aliases) and
+then walks a character trie, so an exact or unique-prefix match costs
+one step per character however many choices a scene has.  Each command
+is also indexed under the tail ends of itself ("fridge" and "mirror",
+"outside" for "step outside"), which only count when nothing matches
+the front of a command, so "fridge" still opens the fridge.
+
+Only when all of that fails does it fall back to a typo-tolerant
+search.  That one walks the trie with a band of an edit-distance table,
+dropping a branch once it's too many edits away to ever match, and
+costs tens of microseconds rather than a fraction of one; each index
+remembers its last few hundred misses so the same typo is only paid
+for once.
+
+    >>> index = CommandIndex(["look in fridge", "look in mirror", "leave"])
+    >>> index.lookup("Look at the mirror")
+    ('look in mirror',)
+    >>> index.lookup("lea")
+    ('leave',)
+    >>> index.lookup("look")
+    ('look in fridge', 'look in mirror')
+    >>> index.lookup("look in mirorr")
+    ('look in mirror',)
+    >>> index.lookup("fridge")
+    ('look in fridge',)
+"""
+
+# words that don't change which command somebody meant
+FILLER = frozenset(("a", "an", "the", "in", "into", "at", "on", "to", "my", "his"))
+
+# word-for-word stand-ins, applied before the trie is searched
+ALIASES = {
+    "i": "inventory",
+    "inv": "inventory",
+    "l": "look",
+    "x": "look",
+    "examine": "look",
+    "exit": "leave",
+    "grab": "pick up",
+    "take": "pick up",
+}
+
+# curly quotes become straight ones, anything else that isn't a letter,
+# digit or apostrophe is just a word break
+_PUNCTUATION = "!\"#$%&()*+,-./:;<=>?@[\\]^_`{|}~“”"
+_TABLE = str.maketrans({"‘": "'", "’": "'", **dict.fromkeys(_PUNCTUATION, " ")})
+
+
+def normalize(text):
+    """Reduce ``text`` to the form commands are indexed under.
+
+    >>> normalize("  Look in the MIRROR! ")
+    'look mirror'
+    >>> normalize("grab tooth")
+    'pick up tooth'
+    """
+    words = []
+    for word in text.lower().translate(_TABLE).split():
+        word = ALIASES.get(word, word)
+        if word not in FILLER:
+            words.append(word)
+    return " ".join(words)
+
+
+# misses each index remembers the answer to
+MISS_CACHE = 256
+
+
+def max_typos(key):
+    """How many edits to forgive in ``key``: none for tiny words."""
+    if len(key) <= 3:
+        return 0
+    return 1 if len(key) <= 7 else 2
+
+
+class _Node:
+    __slots__ = ("children", "command", "below", "tail", "tails_below")
+
+    def __init__(self):
+        self.children = {}
+        # the command that ends exactly here, if any
+        self.command = None
+        # every command in this subtree, in the scene's order
+        self.below = ()
+        # the same two for commands indexed here by their tail ends
+        self.tail = ()
+        self.tails_below = ()
+
+
+class CommandIndex:
+    """A trie of a scene's commands keyed by their normalized form."""
+
+    __slots__ = ("root", "commands", "order", "misses")
+
+    def __init__(self, commands):
+        self.root = _Node()
+        self.commands = {}
+        for command in commands:
+            key = normalize(command)
+            if key in self.commands:
+                raise ValueError(
+                    f"{command!r} and {self.commands[key]!r} read the same once normalized"
+                )
+            self.commands[key] = command
+            node = self.root
+            node.below += (command,)
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+                node.below += (command,)
+            node.command = command
+        for key, command in self.commands.items():
+            words = key.split()
+            for start in range(1, len(words)):
+                node = self.root
+                for char in " ".join(words[start:]):
+                    node = node.children.setdefault(char, _Node())
+                    # a repeated word can lead here twice for one command
+                    if command not in node.tails_below:
+                        node.tails_below += (command,)
+                if command not in node.tail:
+                    node.tail += (command,)
+        # each command's place in the scene, for sorting typo matches
+        self.order = {command: place for place, command in enumerate(self.commands.values())}
+        self.misses = {}
+
+    def lookup(self, text):
+        """Return the commands ``text`` could mean.
+
+        One command is a match; several means the input was ambiguous;
+        an empty tuple means nothing came close.
+        """
+        key = normalize(text)
+        if not key:
+            return ()
+        node = self.root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return self._miss(key)
+        if node.command is not None:
+            return (node.command,)
+        if node.below:
+            return node.below
+        return node.tail or node.tails_below
+
+    def _miss(self, key):
+        found = self.misses.get(key)
+        if found is None:
+            if len(self.misses) >= MISS_CACHE:
+                # the oldest goes; dicts keep insertion order
+                del self.misses[next(iter(self.misses))]
+            found = self.misses[key] = self._fuzzy(key)
+        return found
+
+    def _fuzzy(self, key):
+        """The nearest commands within ``max_typos(key)`` edits of ``key``."""
+        limit = max_typos(key)
+        if not limit:
+            return ()
+        # matches on a whole command and on a tail end are kept apart:
+        # a tail only counts if no whole command came close
+        best = tail_best = limit
+        found = []
+        tails = []
+        width = len(key)
+        # rows of the edit-distance table only fill the band of cells
+        # within ``limit`` of the diagonal; anything outside is too far
+        first = list(range(width + 1))
+        stack = [(child, char, first, 1) for char, child in self.root.children.items()]
+        while stack:
+            node, char, above, depth = stack.pop()
+            row = [limit + 1] * (width + 1)
+            lowest = limit + 1
+            if depth <= limit:
+                row[0] = lowest = depth
+            for column in range(max(1, depth - limit), min(width, depth + limit) + 1):
+                cost = above[column - 1] + (key[column - 1] != char)
+                if row[column - 1] < cost:
+                    cost = row[column - 1] + 1
+                if above[column] < cost:
+                    cost = above[column] + 1
+                row[column] = cost
+                if cost < lowest:
+                    lowest = cost
+            distance = row[width]
+            if node.command is not None and distance <= best:
+                if distance < best:
+                    best = distance
+                    found = []
+                found.append(node.command)
+            if node.tail and distance <= tail_best:
+                if distance < tail_best:
+                    tail_best = distance
+                    tails = []
+                tails.extend(node.tail)
+            if lowest <= best or lowest <= tail_best:
+                for next_char, child in node.children.items():
+                    stack.append((child, next_char, row, depth + 1))
+        return tuple(sorted(set(found or tails), key=self.order.__getitem__))
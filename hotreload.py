@@ -0,0 +1,204 @@
+"""Hot reload: pick up edits to the world's data files without a restart.
+
+    python server.py --reload            # look for edits every second
+    python server.py --reload 5          # ... every five
+    kill -USR1 <server pid>              # log what the reloads cost
+
+A watcher polls the stamp of the files under Travis_Vaelen/World (their
+sizes and mtimes, see world.py).  Once it has changed and then held
+still for a poll, so an editor's save is finished, the world is
+compiled and built on a worker thread and the finished ``World``
+replaces the old one in a single step on the event loop, between two
+turns: every session started from then on plays in it.  A world that
+doesn't compile is logged and the one being played stays.
+
+Sessions already playing move over at their next menu prompt, the one
+point in a session where nothing from the old world is running: a
+fight, stare-down or karaoke finishes on the closures it started with.
+The move is by name (the scene the player is in, each item carried,
+each flag earned; see ``world.remap``) and anything that's gone is a
+stale reference.  Items and flags that are gone are dropped and
+logged.  A session whose scene is gone stays in the old world, which
+still plays to the end, is logged once, and tries again at every menu
+in case a later edit brings the scene back.  An old world is let go as
+soon as no session is left in it.
+
+``report()`` has what it cost: how long each reload took to compile and
+build, how long each session's move took, and how long it was until the
+last session had left the old world.
+"""
+import asyncio
+import logging
+import time
+
+import game
+import world
+from latency import Histogram
+
+log = logging.getLogger("swamp.reload")
+
+# seconds between looks at the data files
+INTERVAL = 1.0
+
+
+def _short(loaded):
+    return loaded.digest.hex()[:8]
+
+
+class Reloader:
+    """The world new sessions get, the older ones still being played, and their sessions."""
+
+    def __init__(self, directory=world.WORLD_DIR, path=world.CACHE):
+        self.directory = directory
+        self.path = path
+        self.stamp = world.stamp(directory)
+        self.world = world.load(directory, path)
+        game.install(self.world)
+        # id(world.scenes) -> the world, and how many sessions are in it;
+        # a session's ``scenes`` is all it keeps of the world it's in
+        self.worlds = {id(self.world.scenes): self.world}
+        self.sessions = {id(self.world.scenes): 0}
+        # id(state) for sessions whose scene is gone, so they're logged once
+        self.stuck = set()
+        # id(world.scenes) -> when it stopped being the current world
+        self.retiring = {}
+        self.reloads = []
+        self.failed = 0
+        self.moves = Histogram()
+        self.moved = 0
+        self.dropped = 0
+        self.drains = Histogram()
+
+    @property
+    def scenes(self):
+        """The scene map a session starting now should get."""
+        return self.world.scenes
+
+    def join(self, state):
+        """Count a new session as playing in the world its ``scenes`` came from."""
+        self.sessions[id(state.scenes)] += 1
+
+    def leave(self, state):
+        key = id(state.scenes)
+        self.stuck.discard(id(state))
+        self.sessions[key] -= 1
+        if not self.sessions[key] and key != id(self.world.scenes):
+            self._retire(key)
+
+    def refresh(self, state):
+        """Move ``state`` into the current world if it isn't there yet.
+
+        Only call this at a menu prompt: anything interactive still
+        running belongs to the world it started in.  True if it moved.
+        """
+        if state.scenes is self.world.scenes:
+            return False
+        key = id(state.scenes)
+        began = time.perf_counter()
+        dropped = world.remap(state, self.worlds[key], self.world)
+        self.moves.record(time.perf_counter() - began)
+        if dropped is None:
+            if id(state) not in self.stuck:
+                self.stuck.add(id(state))
+                log.warning(
+                    "scene %r is gone: session stays in world %s",
+                    state.current_scene.name, _short(self.worlds[key]),
+                )
+            return False
+        self.stuck.discard(id(state))
+        self.moved += 1
+        self.sessions[id(self.world.scenes)] += 1
+        self.sessions[key] -= 1
+        if dropped:
+            self.dropped += len(dropped)
+            log.warning("session in %r dropped %s", state.current_scene.name, ", ".join(dropped))
+        if not self.sessions[key]:
+            self._retire(key)
+        return True
+
+    def _retire(self, key):
+        old = self.worlds.pop(key)
+        del self.sessions[key]
+        drained = time.monotonic() - self.retiring.pop(key)
+        self.drains.record(drained)
+        log.info("world %s let go %.2fs after it was replaced", _short(old), drained)
+
+    def _build(self):
+        compiled, digest = world.image(self.directory, self.path)
+        return world.World(compiled, digest)
+
+    async def reload(self):
+        """Compile the world off the event loop and swap it in; False if nothing changed."""
+        began = time.perf_counter()
+        try:
+            loaded = await asyncio.get_running_loop().run_in_executor(None, self._build)
+        except (OSError, ValueError) as exc:
+            # a file half-saved or with a mistake in it
+            self.failed += 1
+            log.error("world not reloaded, still playing %s: %s", _short(self.world), exc)
+            return False
+        elapsed = time.perf_counter() - began
+        if loaded.digest == self.world.digest:
+            return False
+        self.install(loaded, elapsed)
+        return True
+
+    def install(self, loaded, elapsed=0.0):
+        old = self.world
+        key = id(loaded.scenes)
+        self.world = loaded
+        self.worlds[key] = loaded
+        self.sessions[key] = 0
+        game.install(loaded)
+        self.reloads.append(elapsed)
+        waiting = self.sessions[id(old.scenes)]
+        log.info(
+            "world %s replaced %s after %.1f ms; %d sessions to move",
+            _short(loaded), _short(old), elapsed * 1e3, waiting,
+        )
+        self.retiring[id(old.scenes)] = time.monotonic()
+        if not waiting:
+            self._retire(id(old.scenes))
+
+    async def watch(self, interval=INTERVAL):
+        """Reload whenever the data files change, until cancelled."""
+        changed = False
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                current = world.stamp(self.directory)
+            except OSError:
+                # a file briefly missing while an editor saves it
+                continue
+            if current != self.stamp:
+                self.stamp = current
+                changed = True
+            elif changed:
+                changed = False
+                await self.reload()
+
+    def report(self):
+        """What reloading has cost so far, as a few lines of text."""
+        lines = [f"world {_short(self.world)}: {len(self.reloads)} reloads, {self.failed} failed"]
+        if self.reloads:
+            lines.append(
+                f"compile and build: last {self.reloads[-1] * 1e3:.1f} ms, "
+                f"worst {max(self.reloads) * 1e3:.1f} ms"
+            )
+        moves = self.moves
+        lines.append(
+            f"sessions moved: {self.moved}, p50 {moves.quantile(0.5) * 1e6:.0f} us, "
+            f"p99 {moves.quantile(0.99) * 1e6:.0f} us, max {moves.max} us; "
+            f"{self.dropped} items and flags dropped"
+        )
+        older = {key: count for key, count in self.sessions.items() if key != id(self.world.scenes)}
+        lines.append(
+            f"still in older worlds: {sum(older.values())} sessions in {len(older)} worlds, "
+            f"{len(self.stuck)} of them with their scene gone"
+        )
+        if self.drains.count:
+            lines.append(
+                f"old worlds let go after: p50 {self.drains.quantile(0.5):.2f}s, "
+                f"max {self.drains.max / 1e6:.2f}s"
+            )
+        return "\n".join(lines)
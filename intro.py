@@ -1,3 +1,8 @@
+from commands import CommandIndex
+
+CHOICES = CommandIndex(['step outside', 'check the fridge', 'look in the mirror', 'inventory'])
+
+
 def main():
     inventory = [
         "A half-empty flask labeled \"'shine\"",
@@ -13,20 +18,21 @@ def main():
         "and his trusty shotgun restin' across an altar made from old hubcaps."
     )
 
-    choice = input("Do ya wanna 'step outside', 'check the fridge', 'look in the mirror', or 'inventory'? ").strip().lower()
+    matches = CHOICES.lookup(input("Do ya wanna 'step outside', 'check the fridge', 'look in the mirror', or 'inventory'? "))
+    choice = matches[0] if len(matches) == 1 else None
 
-    if 'step' in choice or 'outside' in choice:
+    if choice == 'step outside':
         print(
             "Travis kicks open the screen door and steps into the muggy mornin'. "
             "The neighbor's cat hisses from under the porch, and the sweet stank of "
             "swamp tells him today's gonna be a doozy."
         )
-    elif 'fridge' in choice or 'check' in choice:
+    elif choice == 'check the fridge':
         print(
             "He yanks open the fridge, findin' leftover possum stew next to a jar of "
             "glowin' moonshine. Breakfast of champions!"
         )
-    elif 'mirror' in choice:
+    elif choice == 'look in the mirror':
         print(
             "Travis catches a glimpse of himself in the cracked bathroom mirror and can't help but grin."
         )
@@ -42,7 +48,7 @@ def main():
         print(
             "With Florida-man swagger dialed up to eleven, Travis winks at himself, absolutely unhinged and lovin' it."
         )
-    elif 'inventory' in choice:
+    elif choice == 'inventory':
         print("Travis pats his pockets and rummages through his stash:")
         for item in inventory:
             print(f"- {item}")
@@ -0,0 +1,314 @@
+"""Crash recovery: an append-only log of every change to a session.
+
+    python server.py --journal /var/lib/swamp/journal
+    python journal.py /var/lib/swamp/journal                    # after a crash: who was where
+    python journal.py /var/lib/swamp/journal --save saved.bin   # ... kept for snapshot.load_many
+
+Everything that changes a ``GameState`` goes through one of its methods
+(``move_to``, ``set_flag``, ``add_item``, ``add_stat``, ...), and with
+a journal attached each of them also appends a typed event: a 13-byte
+record of kind, argument and value.  A turn's events are held back
+until the menu comes round again and then closed with a TURN record
+carrying the dice's state, so the log only ever has whole turns in it.
+A crash in the middle of a fight loses that fight, just as a snapshot
+can't be taken during one.
+
+Closed turns are collected in memory and written in batches.  That
+happens when a session has ``FLUSH_BYTES`` waiting, when the session
+ends, and every ``--journal-interval`` for every session at once.  A
+busy server makes one write per session per interval, not one per turn.
+
+A log starts with a checkpoint, which is a ``snapshot`` record of the
+session.  Once ``COMPACT_BYTES`` of events have piled up behind it, a
+new checkpoint goes into a fresh file that replaces the log, and the
+events before it are gone.  Recovering a session therefore costs one
+snapshot load plus at most that many bytes of events.  A session that
+ends cleanly deletes its log, so after a crash the directory holds
+exactly the players who were cut off.
+
+A log names scenes and items by their index in the tables in its
+header, which come from the world the session is in.  When a hot reload
+moves a session into a newer world (see hotreload.py), it gets that
+world's tables and a fresh checkpoint, so a log never mixes two.
+"""
+import argparse
+import asyncio
+import glob
+import logging
+import os
+import struct
+import sys
+import time
+
+import game
+import snapshot
+from combat import MOVES
+
+log = logging.getLogger("swamp.journal")
+
+MAGIC = b"SWMPJRNL"
+VERSION = 1
+# magic, version, length of the scene and item tables that follow
+HEADER = struct.Struct("<8sBI")
+# kind, argument, value
+EVENT = struct.Struct("<BiQ")
+
+# what an event is; its argument and value are
+MOVE = 1  # -, scene index
+SET_FLAG = 2  # -, flag bits
+CLEAR_FLAG = 3  # -, flag bits
+ADD_ITEM = 4  # item ID, -
+REMOVE_ITEM = 5  # item ID, -
+ADD_STAT = 6  # amount, index into combat.MOVES
+FINISH = 7  # -, -
+TURN = 8  # -, the dice's state; closes a turn
+
+STAT_INDEX = {stat: index for index, stat in enumerate(MOVES)}
+
+# closed turns a session keeps in memory before writing them out
+FLUSH_BYTES = 1024
+# events after a checkpoint before the log is compacted to a new one
+COMPACT_BYTES = 8192
+# how often every session's closed turns are written, seconds
+INTERVAL = 1.0
+
+_event = EVENT.pack
+
+
+class Journal:
+    """One session's log: the turn being played, and closed turns not yet written."""
+
+    __slots__ = ("path", "header", "scene_index", "turn", "closed", "logged", "dice")
+
+    def __init__(self, path, header, scene_index):
+        self.path = path
+        self.header = header
+        self.scene_index = scene_index
+        self.turn = bytearray()
+        self.closed = bytearray()
+        # bytes of events in the file after its checkpoint, or None before the first
+        self.logged = None
+        # the dice's state as of the last closed turn
+        self.dice = None
+
+    # ``GameState`` calls these after making each change
+
+    def move_to(self, scene_name):
+        self.turn += _event(MOVE, 0, self.scene_index[scene_name])
+
+    def set_flag(self, flag):
+        self.turn += _event(SET_FLAG, 0, flag)
+
+    def clear_flag(self, flag):
+        self.turn += _event(CLEAR_FLAG, 0, flag)
+
+    def add_item(self, item):
+        self.turn += _event(ADD_ITEM, item, 0)
+
+    def remove_item(self, item):
+        self.turn += _event(REMOVE_ITEM, item, 0)
+
+    def add_stat(self, stat, amount):
+        self.turn += _event(ADD_STAT, amount, STAT_INDEX[stat])
+
+    def finish(self):
+        self.turn += _event(FINISH, 0, 0)
+
+    def commit(self, state):
+        """Close the turn just played; call this at every menu prompt."""
+        dice = state.rng.state
+        if not self.turn and dice == self.dice:
+            return
+        if self.logged is None or self.logged + len(self.closed) + len(self.turn) >= COMPACT_BYTES:
+            self.checkpoint(state)
+            return
+        self.turn += _event(TURN, 0, dice)
+        self.dice = dice
+        self.closed += self.turn
+        self.turn.clear()
+        if len(self.closed) >= FLUSH_BYTES:
+            self.flush()
+
+    def checkpoint(self, state):
+        """Replace the log with one holding just ``state``: the compaction."""
+        snapshot._check(state)
+        # against this log's own tables: the world the session is in, even
+        # if a newer one has been installed since
+        record = snapshot._pack(state, self.scene_index, snapshot.record(len(state.items)))
+        # write then rename, so a crash leaves the old log or the new one
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as file:
+            file.write(self.header + record)
+        os.replace(temp, self.path)
+        self.turn.clear()
+        self.closed.clear()
+        self.logged = 0
+        self.dice = state.rng.state
+
+    def flush(self):
+        if self.closed:
+            try:
+                with open(self.path, "ab") as file:
+                    file.write(self.closed)
+            except OSError:
+                # part of the batch may have made it in: the next turn
+                # starts the log over with a checkpoint instead
+                log.exception("couldn't write %s", self.path)
+                self.logged = None
+            else:
+                self.logged += len(self.closed)
+            self.closed.clear()
+
+    def discard(self):
+        """The session is over and there's nothing left to recover."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            # it ended before its first menu, so it never had a log
+            pass
+
+
+class Journals:
+    """The live sessions' journals in one directory, flushed together."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        # the current world's names, and the header and scene index made from them
+        self.names = None
+        self.header = self.scene_index = None
+        self.live = set()
+
+    def _tables(self):
+        names = snapshot._scene_table(), game.ITEM_NAMES
+        if names != self.names:
+            scene_names, item_names = self.names = names
+            tables = "\n".join(scene_names).encode() + b"\0" + "\n".join(item_names).encode()
+            self.header = HEADER.pack(MAGIC, VERSION, len(tables)) + tables
+            self.scene_index = {name: index for index, name in enumerate(scene_names)}
+        return self.header, self.scene_index
+
+    def open(self, name):
+        """A journal for a session starting now, in the current world."""
+        journal = Journal(os.path.join(self.directory, f"{name}.log"), *self._tables())
+        self.live.add(journal)
+        return journal
+
+    def moved(self, journal, state):
+        """``state`` has just been moved into the current world: start its log over there."""
+        journal.header, journal.scene_index = self._tables()
+        journal.checkpoint(state)
+
+    def close(self, journal):
+        self.live.discard(journal)
+        journal.discard()
+
+    def flush(self):
+        for journal in self.live:
+            journal.flush()
+
+    async def watch(self, interval=INTERVAL):
+        """Write out every session's closed turns each ``interval``, until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            self.flush()
+
+
+def _replay(state, events, scenes, scene_names):
+    items = state.items
+    for kind, argument, value in events:
+        if kind == MOVE:
+            state.current_scene = scenes[scene_names[value]]
+        elif kind == SET_FLAG:
+            state.flags |= value
+        elif kind == CLEAR_FLAG:
+            state.flags &= ~value
+        elif kind == ADD_ITEM:
+            items[argument] += 1
+        elif kind == REMOVE_ITEM:
+            items[argument] -= 1
+        elif kind == ADD_STAT:
+            stat = MOVES[value]
+            setattr(state, stat, getattr(state, stat) + argument)
+        elif kind == FINISH:
+            state.finished = True
+        else:
+            raise ValueError(f"unknown journal event {kind}")
+
+
+def recover(path, say=None):
+    """Rebuild a session from its log: the checkpoint, then every whole turn after it.
+
+    Returns the ``GameState`` and how many turns were replayed.  Like a
+    restored snapshot, the session picks up at its menu without rerunning
+    the scene's enter hook.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    try:
+        magic, version, table_len = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError(f"{path} is not a swamp journal") from None
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a swamp journal")
+    if version != VERSION:
+        raise ValueError(f"unsupported journal version {version}")
+    start = HEADER.size + table_len
+    scene_table, _, item_table = data[HEADER.size:start].partition(b"\0")
+    if tuple(item_table.decode().split("\n")) != game.ITEM_NAMES:
+        raise ValueError(f"{path} was written with a different item list")
+    layout = snapshot.record()
+    if len(data) < start + layout.size:
+        raise ValueError(f"{path} has no checkpoint")
+    scene_names = tuple(scene_table.decode().split("\n"))
+    scenes = game.get_scenes()
+    state = snapshot._restore(layout.unpack_from(data, start), scenes, scene_names, say)
+    # a crash can leave half a record, or half a turn, on the end
+    begin = start + layout.size
+    end = begin + (len(data) - begin) // EVENT.size * EVENT.size
+    turns = 0
+    pending = []
+    for event in EVENT.iter_unpack(memoryview(data)[begin:end]):
+        if event[0] == TURN:
+            _replay(state, pending, scenes, scene_names)
+            state.rng.state = event[2]
+            pending.clear()
+            turns += 1
+        else:
+            pending.append(event)
+    return state, turns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recover the sessions a crash left journals for.")
+    parser.add_argument("directory")
+    parser.add_argument("--save", metavar="PATH", help="write the recovered sessions with snapshot.dump_many")
+    args = parser.parse_args(argv)
+    states = []
+    failed = 0
+    began = time.perf_counter()
+    for path in sorted(glob.glob(os.path.join(args.directory, "*.log"))):
+        name = os.path.basename(path)[:-len(".log")]
+        try:
+            start = time.perf_counter()
+            state, turns = recover(path)
+            elapsed = time.perf_counter() - start
+        except (OSError, ValueError) as exc:
+            print(f"{name}: {exc}", file=sys.stderr)
+            failed += 1
+            continue
+        states.append(state)
+        print(
+            f"{name}  {state.current_scene.name:<26}{turns:>5} turns replayed"
+            f"{os.path.getsize(path):>8} B{elapsed * 1e6:>9.0f} us"
+        )
+    elapsed = time.perf_counter() - began
+    print(f"recovered {len(states)} sessions ({failed} failed) in {elapsed * 1e3:.1f} ms")
+    if args.save and states:
+        snapshot.dump_many(states, args.save)
+        print(f"saved to {args.save}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
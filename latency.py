@@ -0,0 +1,220 @@
+"""Turn latency per scene and command: histograms, percentiles and an SLO.
+
+    python game.py --latency turns.prom             # written every 15s and at the end
+    python server.py --latency /var/lib/swamp/turns.prom --slo-ms 20
+
+A turn's latency runs from the player's line arriving to the output it
+produced (and the next prompt) being flushed.  Each (scene, command)
+pair gets a log-linear histogram in the style of HdrHistogram: exact up
+to 64 us, then 32 buckets per doubling, so any percentile is within about
+3% of the truth however long the tail gets, in a few hundred bytes.
+Replies that aren't menu commands (fight moves, the karaoke) are filed
+under "(reply)" in the scene they happen in, so a slow fight shows up as
+its scene's replies.
+
+The Prometheus file is plain text format: a histogram with fixed
+buckets for aggregation, the p50/p99/p999 as gauges and a count of turns
+over the SLO threshold.  It's written to a temporary file and renamed,
+so a scraper never reads half of one.
+"""
+import math
+import os
+import time
+
+from commands import normalize
+
+# 32 sub-buckets per power of two
+SUB_BITS = 5
+SUB = 1 << SUB_BITS
+
+# turns slower than this break the SLO, and this share has to be faster
+SLO_SECONDS = 0.05
+SLO_TARGET = 0.999
+
+QUANTILES = (0.5, 0.99, 0.999)
+
+# Prometheus bucket edges, seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# how often a long-running game or server rewrites its file
+INTERVAL = 15.0
+
+REPLY = "(reply)"
+UNKNOWN = "(unknown)"
+AMBIGUOUS = "(ambiguous)"
+
+
+def _index(us):
+    if us < 2 * SUB:
+        return us
+    shift = us.bit_length() - SUB_BITS - 1
+    return SUB * (shift + 1) + (us >> shift) - SUB
+
+
+def _highest(index):
+    """The largest microsecond value that lands in bucket ``index``."""
+    if index < 2 * SUB:
+        return index
+    shift = index // SUB - 1
+    return ((index % SUB + SUB + 1) << shift) - 1
+
+
+class Histogram:
+    """Counts of microsecond latencies in log-linear buckets."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        # seconds, for Prometheus' _sum
+        self.total = 0.0
+        self.max = 0
+
+    def record(self, seconds):
+        us = int(seconds * 1e6)
+        index = _index(us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if us > self.max:
+            self.max = us
+
+    def quantile(self, q):
+        """The latency ``q`` of turns came in under, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_highest(index), self.max) / 1e6
+        return self.max / 1e6
+
+    def at_most(self, seconds):
+        """How many turns took no longer than ``seconds``, to bucket precision."""
+        limit = seconds * 1e6
+        return sum(count for index, count in self.counts.items() if _highest(index) <= limit)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+
+def command_label(scene, prompt, line, menu):
+    """What to file a line typed at ``prompt`` under, in ``scene``.
+
+    Only the menu's commands get their own label; everything else is
+    one of a handful of fixed ones, so the label set stays small however
+    much nonsense players type.
+    """
+    if prompt != menu:
+        return REPLY
+    choice = line.strip().lower()
+    if choice in scene.choices:
+        return choice
+    if normalize(choice) == "quit":
+        return "quit"
+    if choice.startswith("width "):
+        return "width"
+    matches = scene.resolve(choice)
+    if not matches:
+        return UNKNOWN
+    return matches[0] if len(matches) == 1 else AMBIGUOUS
+
+
+class Latency:
+    """Every scene and command's histogram, with the SLO to judge them by."""
+
+    def __init__(self, slo=SLO_SECONDS, target=SLO_TARGET):
+        self.slo = slo
+        self.target = target
+        self.histograms = {}
+        self.written = time.monotonic()
+
+    def record(self, scene, command, seconds):
+        histogram = self.histograms.get((scene, command))
+        if histogram is None:
+            histogram = self.histograms[scene, command] = Histogram()
+        histogram.record(seconds)
+
+    def overall(self):
+        total = Histogram()
+        for histogram in self.histograms.values():
+            total.merge(histogram)
+        return total
+
+    def report(self):
+        """A table of percentiles per key, worst p99 first, and the verdict."""
+        lines = [
+            f"{'scene':<26}{'command':<22}{'turns':>8}{'p50 ms':>9}{'p99 ms':>9}"
+            f"{'p999 ms':>9}{'max ms':>9}{'in SLO':>9}"
+        ]
+        rows = sorted(self.histograms.items(), key=lambda item: -item[1].quantile(0.99))
+        for (scene, command), histogram in rows + [(("all", ""), self.overall())]:
+            p50, p99, p999 = (histogram.quantile(q) * 1e3 for q in QUANTILES)
+            within = histogram.at_most(self.slo) / histogram.count if histogram.count else 1.0
+            lines.append(
+                f"{scene:<26}{command:<22}{histogram.count:>8}{p50:>9.3f}{p99:>9.3f}"
+                f"{p999:>9.3f}{histogram.max / 1e3:>9.3f}{within:>9.3%}"
+            )
+        verdict = "met" if self.met() else "MISSED"
+        lines.append(f"SLO {self.slo * 1e3:g} ms for {self.target:.1%} of turns: {verdict}")
+        return "\n".join(lines)
+
+    def met(self):
+        total = self.overall()
+        return not total.count or total.at_most(self.slo) >= self.target * total.count
+
+    def prometheus(self):
+        """Everything in the Prometheus text exposition format."""
+        out = [
+            "# HELP swamp_turn_latency_seconds Input received to output flushed, per turn.",
+            "# TYPE swamp_turn_latency_seconds histogram",
+        ]
+        quantiles = [
+            "# HELP swamp_turn_latency_quantile_seconds Turn latency percentiles.",
+            "# TYPE swamp_turn_latency_quantile_seconds gauge",
+        ]
+        slow = [
+            "# HELP swamp_turn_slo_violations_total Turns slower than the SLO threshold.",
+            "# TYPE swamp_turn_slo_violations_total counter",
+        ]
+        for (scene, command), histogram in sorted(self.histograms.items()):
+            labels = f'scene="{_escape(scene)}",command="{_escape(command)}"'
+            for edge in BUCKETS:
+                count = histogram.at_most(edge)
+                out.append(f'swamp_turn_latency_seconds_bucket{{{labels},le="{edge:g}"}} {count}')
+            out.append(f'swamp_turn_latency_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            out.append(f"swamp_turn_latency_seconds_sum{{{labels}}} {histogram.total:.6f}")
+            out.append(f"swamp_turn_latency_seconds_count{{{labels}}} {histogram.count}")
+            for q in QUANTILES:
+                value = histogram.quantile(q)
+                quantiles.append(f'swamp_turn_latency_quantile_seconds{{{labels},quantile="{q:g}"}} {value:.6f}')
+            over = histogram.count - histogram.at_most(self.slo)
+            slow.append(f"swamp_turn_slo_violations_total{{{labels}}} {over}")
+        slo = [
+            "# HELP swamp_turn_slo_seconds Turn latency SLO threshold.",
+            "# TYPE swamp_turn_slo_seconds gauge",
+            f"swamp_turn_slo_seconds {self.slo:g}",
+        ]
+        return "\n".join(out + quantiles + slow + slo) + "\n"
+
+    def write(self, path):
+        # write then rename, so a scraper never sees half a file
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w") as file:
+            file.write(self.prometheus())
+        os.replace(temp, path)
+        self.written = time.monotonic()
+
+    def due(self, interval=INTERVAL):
+        return time.monotonic() - self.written >= interval
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,180 @@
+"""Load generator: lots of bot players against a running game server.
+
+    python server.py --port 4000 &
+    python loadgen.py --players 2000 --duration 60
+    python loadgen.py --players 500 --mix speedrunner=1 --think-scale 0   # flat out
+
+Every player is its own TCP connection and its own persona from bots.py,
+reading each turn off the socket and typing back after a think time.
+The number of connected players is held at ``--players``: when a game
+ends or a bot wanders off, a fresh one takes its place.  Players join
+over ``--ramp`` seconds so the server isn't hit by one big wave.
+
+A turn's latency here is what the player sees: from the line being
+sent to the whole next prompt arriving.  The report has turns per
+second and p50/p99/p999 for every persona and overall.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import bots
+from latency import Histogram
+
+# how likely each persona is to be the next player to join
+DEFAULT_MIX = {"speedrunner": 0.2, "wanderer": 0.6, "fight_spammer": 0.2}
+
+# how long to wait for the rest of a turn that stopped mid-line
+SETTLE = 0.25
+
+
+class Stats:
+    """What one persona's players got up to."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.sessions = 0
+        self.finished = 0
+        self.errors = 0
+
+    @property
+    def turns(self):
+        return self.latency.count
+
+
+async def read_turn(reader, scene, timeout):
+    """Read up to and including the next prompt; None once the server hangs up."""
+    text = ""
+    while True:
+        try:
+            chunk = await asyncio.wait_for(reader.read(1 << 16), SETTLE if text else timeout)
+        except asyncio.TimeoutError:
+            if not text:
+                raise
+            # a prompt we don't recognise: give the bot what there is
+            return text, bots.Screen(scene, (), text.rpartition("\n")[2], None)
+        if not chunk:
+            return text, None
+        text += chunk.decode("utf-8", "replace")
+        screen = bots.read_screen(text, scene)
+        if screen:
+            return text, screen
+
+
+async def play(bot, stats, host, port, think_scale, deadline, timeout):
+    """One player's whole session."""
+    stats.sessions += 1
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        stats.errors += 1
+        return
+    scene = None
+    try:
+        sent = None
+        while True:
+            text, screen = await read_turn(reader, scene, timeout)
+            if sent is not None:
+                stats.latency.record(time.perf_counter() - sent)
+            if screen is None:
+                if "THE END" in text:
+                    stats.finished += 1
+                return
+            scene = screen.scene
+            line = bot.reply(screen)
+            if line is None or time.monotonic() >= deadline:
+                return
+            await asyncio.sleep(bot.think(screen, think_scale))
+            writer.write(line.encode() + b"\n")
+            sent = time.perf_counter()
+    except (OSError, asyncio.TimeoutError):
+        stats.errors += 1
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+async def player_slot(slot, args, mix, results, deadline):
+    """Keep one player connected until the run is over."""
+    rng = random.Random(args.seed * 1_000_003 + slot if args.seed is not None else None)
+    await asyncio.sleep(args.ramp * slot / max(args.players, 1))
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        bot = bots.PERSONAS[name](random.Random(rng.getrandbits(64)))
+        started = time.monotonic()
+        await play(bot, results[name], args.host, args.port, args.think_scale, deadline, args.timeout)
+        if time.monotonic() - started < 0.01:
+            # the server is refusing us; don't spin
+            await asyncio.sleep(1)
+
+
+async def run(args, mix):
+    results = {name: Stats() for name in mix}
+    deadline = time.monotonic() + args.duration
+    began = time.perf_counter()
+    slots = (player_slot(slot, args, mix, results, deadline) for slot in range(args.players))
+    await asyncio.gather(*slots)
+    return results, time.perf_counter() - began
+
+
+def report(results, elapsed):
+    print(
+        f"{'persona':<15}{'sessions':>9}{'won':>6}{'errors':>8}{'turns':>9}{'turns/s':>9}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'p999 ms':>9}{'max ms':>9}"
+    )
+    total = Stats()
+    for name, stats in list(results.items()) + [("all", total)]:
+        if stats is not total:
+            total.latency.merge(stats.latency)
+            total.sessions += stats.sessions
+            total.finished += stats.finished
+            total.errors += stats.errors
+        histogram = stats.latency
+        print(
+            f"{name:<15}{stats.sessions:>9}{stats.finished:>6}{stats.errors:>8}{stats.turns:>9}"
+            f"{stats.turns / elapsed:>9.1f}{histogram.quantile(0.5) * 1e3:>9.2f}"
+            f"{histogram.quantile(0.99) * 1e3:>9.2f}{histogram.quantile(0.999) * 1e3:>9.2f}"
+            f"{histogram.max / 1e3:>9.2f}"
+        )
+    return total
+
+
+def _mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in bots.PERSONAS:
+            known = ", ".join(bots.PERSONAS)
+            raise argparse.ArgumentTypeError(f"unknown persona {name!r}; pick from {known}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive a game server with bot players.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--players", type=int, default=100, help="players connected at once")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run for")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds to bring every player in")
+    parser.add_argument("--mix", type=_mix, default=DEFAULT_MIX, metavar="NAME=WEIGHT,...")
+    parser.add_argument("--think-scale", type=float, default=1.0, help="0 answers at once")
+    parser.add_argument("--timeout", type=float, default=30.0, help="give up on a turn after this long")
+    parser.add_argument("--seed", type=int, help="make the bots' choices repeatable")
+    args = parser.parse_args(argv)
+
+    results, elapsed = asyncio.run(run(args, args.mix))
+    print(f"{args.players} players for {elapsed:.1f}s against {args.host}:{args.port}")
+    total = report(results, elapsed)
+    return 1 if total.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""Exact odds for the d20 boss fights in game.py.
+
+Each fight is a small absorbing Markov chain over (boss HP, Travis HP,
+status), so instead of sampling it like simulate.py does we can just
+solve it.  For every state we work out the exact chance Travis wins, the
+expected number of turns left and the move that gives him the best shot.
+
+``solve_spec`` does the same for any ``combat.BossSpec`` from its
+numbers alone, so a fight with a tweaked HP or threshold can be scored
+without writing its chain out by hand.
+
+Answers are exact ``Fraction`` values and are memoized per stat vector,
+so after the first query for a given set of stats everything is a dict
+lookup.
+
+    >>> from odds import solve
+    >>> float(solve("lot_lizard").win)
+    0.68256
+"""
+import argparse
+from fractions import Fraction
+from functools import lru_cache
+
+import combat
+
+MOVES = ("flex", "flirt", "yeehaw")
+DEFAULT_STATS = {"flex": 2, "flirt": 3, "yeehaw": 1}
+FIGHTS = ("lot_lizard", "meth_zombie", "mole_cricket", "water_bug")
+
+ONE = Fraction(1)
+ZERO = Fraction(0)
+
+
+class Solution:
+    """Exact result for one fight and one stat vector.
+
+    ``states`` maps every live state to ``(win, turns, move)``; ``start``
+    is the state the fight begins in.
+    """
+
+    def __init__(self, fight, stats, start, states):
+        self.fight = fight
+        self.stats = stats
+        self.start = start
+        self.states = states
+
+    @property
+    def win(self):
+        return self.states[self.start][0]
+
+    @property
+    def turns(self):
+        return self.states[self.start][1]
+
+    def best_move(self, state):
+        return self.states[state][2]
+
+    def __repr__(self):
+        return (
+            f"Solution({self.fight!r}, win={float(self.win):.4f}, "
+            f"turns={float(self.turns):.3f})"
+        )
+
+
+def chance(threshold, mod):
+    """Exact chance that d20 + ``mod`` meets ``threshold``."""
+    need = threshold - mod
+    return Fraction(min(max(21 - need, 0), 20), 20)
+
+
+def _pick(options):
+    """Choose the move with the best win chance, then the fewest turns."""
+    return max(options, key=lambda option: (option[0], -option[1]))
+
+
+def _lot_lizard(mods):
+    states = {}
+
+    def value(boss, hp):
+        if boss <= 0:
+            return ONE, ZERO
+        if hp <= 0:
+            return ZERO, ZERO
+        if (boss, hp) not in states:
+            options = []
+            for move, mod in mods.items():
+                p = chance(12, mod)
+                win_hit, turns_hit = value(boss - 1, hp)
+                win_miss, turns_miss = value(boss, hp - 1)
+                options.append((
+                    p * win_hit + (1 - p) * win_miss,
+                    1 + p * turns_hit + (1 - p) * turns_miss,
+                    move,
+                ))
+            states[(boss, hp)] = _pick(options)
+        return states[(boss, hp)][:2]
+
+    value(3, 3)
+    return (3, 3), states
+
+
+def _meth_zombie(mods):
+    states = {}
+
+    def value(wave, zombie, hp):
+        if zombie <= 0:
+            if wave == 3:
+                return ONE, ZERO
+            wave, zombie = wave + 1, 2
+        if hp <= 0:
+            return ZERO, ZERO
+        key = (wave, zombie, hp)
+        if key not in states:
+            options = []
+            for move, mod in mods.items():
+                p = chance(12, mod)
+                win_hit, turns_hit = value(wave, zombie - 1, hp)
+                win_miss, turns_miss = value(wave, zombie, hp - 1)
+                options.append((
+                    p * win_hit + (1 - p) * win_miss,
+                    1 + p * turns_hit + (1 - p) * turns_miss,
+                    move,
+                ))
+            states[key] = _pick(options)
+        return states[key][:2]
+
+    value(1, 2, 3)
+    return (1, 2, 3), states
+
+
+def _mole_cricket(mods):
+    states = {}
+
+    def value(boss, hp, bogged):
+        if boss <= 0:
+            return ONE, ZERO
+        if hp <= 0:
+            return ZERO, ZERO
+        key = (boss, hp, bogged)
+        if key not in states:
+            if bogged:
+                win, turns = value(boss, hp - 1, False)
+                states[key] = (win, 1 + turns, None)
+            else:
+                options = []
+                for move, mod in mods.items():
+                    hit = chance(14, mod)
+                    graze = chance(8, mod) - hit
+                    bog = 1 - hit - graze
+                    win_hit, turns_hit = value(boss - 1, hp, False)
+                    win_bog, turns_bog = value(boss, hp, True)
+                    # a graze changes nothing, so it's a self-loop we solve out
+                    stay = 1 - graze
+                    options.append((
+                        (hit * win_hit + bog * win_bog) / stay,
+                        (1 + hit * turns_hit + bog * turns_bog) / stay,
+                        move,
+                    ))
+                states[key] = _pick(options)
+        return states[key][:2]
+
+    value(5, 3, False)
+    return (5, 3, False), states
+
+
+def _water_bug(mods):
+    states = {}
+    half = Fraction(1, 2)
+
+    def value(boss, hp, confused):
+        if hp <= 0:
+            return ZERO, ZERO
+        if boss <= 1:
+            return ONE, ZERO
+        key = (boss, hp, confused)
+        if key not in states:
+            win_hit, turns_hit = value(boss - 1, hp, False)
+            win_slap, turns_slap = value(boss, hp - 1, False)
+            if confused:
+                # the move is random and another twerk keeps Travis confused
+                third = Fraction(1, len(mods))
+                hit = sum(chance(13, mod) for mod in mods.values()) * third
+                twerk = (1 - hit) * half
+                stay = 1 - twerk
+                states[key] = (
+                    (hit * win_hit + twerk * win_slap) / stay,
+                    (1 + hit * turns_hit + twerk * turns_slap) / stay,
+                    None,
+                )
+            else:
+                win_twerk, turns_twerk = value(boss, hp, True)
+                options = []
+                for move, mod in mods.items():
+                    hit = chance(13, mod)
+                    miss = (1 - hit) * half
+                    options.append((
+                        hit * win_hit + miss * (win_twerk + win_slap),
+                        1 + hit * turns_hit + miss * (turns_twerk + turns_slap),
+                        move,
+                    ))
+                states[key] = _pick(options)
+        return states[key][:2]
+
+    value(4, 3, False)
+    return (4, 3, False), states
+
+
+BOGGED = "bogged"
+CONFUSED = "confused"
+
+# the numbers of a ``combat.BossSpec`` that change the odds
+SPEC_FIELDS = ("boss_hp", "hit", "travis_hp", "waves", "defeated_at", "graze", "on_miss")
+
+
+def _any_fight(mods, boss_hp, hit, travis_hp, waves, defeated_at, graze, on_miss):
+    """The chain for any ``combat.BossSpec``, built from its numbers alone."""
+    states = {}
+    half = Fraction(1, 2)
+    anything = [(Fraction(1, len(mods)), mod) for mod in mods.values()]
+
+    def rolls(key, weighted):
+        """Where one roll goes from ``key``: ``[(chance, next state)]``."""
+        wave, boss, hp, _ = key
+        hit_ = sum(weight * chance(hit, mod) for weight, mod in weighted)
+        graze_ = ZERO
+        if graze is not None:
+            graze_ = sum(weight * chance(graze, mod) for weight, mod in weighted) - hit_
+        miss = 1 - hit_ - graze_
+        steps = [(hit_, (wave, boss - 1, hp, None)), (graze_, (wave, boss, hp, None))]
+        if on_miss == combat.BOG:
+            steps.append((miss, (wave, boss, hp, BOGGED)))
+        elif on_miss == combat.TWERK:
+            steps += [(miss * half, (wave, boss, hp, CONFUSED)), (miss * half, (wave, boss, hp - 1, None))]
+        else:
+            steps.append((miss, (wave, boss, hp - 1, None)))
+        return steps
+
+    def settle(key, steps):
+        # a step back to ``key`` (a graze, another twerk) is a self-loop we solve out
+        stay = sum(p for p, step in steps if step == key)
+        if stay == 1:
+            raise ValueError("that fight can never end")
+        win = turns = ZERO
+        for p, step in steps:
+            if p and step != key:
+                win_step, turns_step = value(*step)
+                win += p * win_step
+                turns += p * turns_step
+        return win / (1 - stay), (1 + turns) / (1 - stay)
+
+    def value(wave, boss, hp, status):
+        if boss <= defeated_at:
+            if wave == waves:
+                return ONE, ZERO
+            wave, boss = wave + 1, boss_hp
+        if hp <= 0:
+            return ZERO, ZERO
+        key = (wave, boss, hp, status)
+        if key not in states:
+            if status == BOGGED:
+                win, turns = value(wave, boss, hp - 1, None)
+                states[key] = (win, 1 + turns, None)
+            elif status == CONFUSED:
+                states[key] = (*settle(key, rolls(key, anything)), None)
+            else:
+                states[key] = _pick([
+                    (*settle(key, rolls(key, [(ONE, mod)])), move) for move, mod in mods.items()
+                ])
+        return states[key][:2]
+
+    start = (1, boss_hp, travis_hp, None)
+    value(*start)
+    return start, states
+
+
+SOLVERS = {
+    "lot_lizard": _lot_lizard,
+    "meth_zombie": _meth_zombie,
+    "mole_cricket": _mole_cricket,
+    "water_bug": _water_bug,
+}
+
+
+@lru_cache(maxsize=4096)
+def _solve(fight, flex, flirt, yeehaw):
+    mods = {"flex": flex, "flirt": flirt, "yeehaw": yeehaw}
+    start, states = SOLVERS[fight](mods)
+    return Solution(fight, mods, start, states)
+
+
+def solve(fight, stats=None):
+    """Solve ``fight`` exactly for the given ``travis_stats`` dict."""
+    stats = dict(DEFAULT_STATS, **(stats or {}))
+    return _solve(fight, stats["flex"], stats["flirt"], stats["yeehaw"])
+
+
+@lru_cache(maxsize=16384)
+def _solve_spec(fight, numbers, flex, flirt, yeehaw):
+    mods = {"flex": flex, "flirt": flirt, "yeehaw": yeehaw}
+    start, states = _any_fight(mods, *numbers)
+    return Solution(fight, mods, start, states)
+
+
+def solve_spec(spec, stats=None):
+    """Solve any ``combat.BossSpec`` exactly, tweaked numbers and all.
+
+    States are ``(wave, boss HP, Travis HP, status)``.  This is what to
+    use for a fight that isn't one of ``FIGHTS`` as written.
+    """
+    stats = dict(DEFAULT_STATS, **(stats or {}))
+    numbers = tuple(getattr(spec, field) for field in SPEC_FIELDS)
+    return _solve_spec(spec.name, numbers, stats["flex"], stats["flirt"], stats["yeehaw"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exact odds for Travis' boss fights.")
+    parser.add_argument("--fight", choices=FIGHTS, action="append")
+    parser.add_argument("--flex", type=int, default=DEFAULT_STATS["flex"])
+    parser.add_argument("--flirt", type=int, default=DEFAULT_STATS["flirt"])
+    parser.add_argument("--yeehaw", type=int, default=DEFAULT_STATS["yeehaw"])
+    parser.add_argument("--states", action="store_true", help="print the optimal move per state")
+    args = parser.parse_args(argv)
+
+    stats = {"flex": args.flex, "flirt": args.flirt, "yeehaw": args.yeehaw}
+    for fight in args.fight or FIGHTS:
+        solution = solve(fight, stats)
+        print(f"{fight:<13} win {float(solution.win):8.4%}   turns {float(solution.turns):6.3f}")
+        if args.states:
+            for state, (win, turns, move) in sorted(solution.states.items()):
+                print(f"    {state!s:<16} {move or '-':<7} {float(win):8.4%} {float(turns):6.3f}")
+
+
+if __name__ == "__main__":
+    main()
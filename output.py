@@ -0,0 +1,142 @@
+"""Collecting a turn's output and writing it out in one go.
+
+Game code calls ``say(line)`` as often as it likes; a ``TurnBuffer``
+just keeps the lines.  When the turn ends with a prompt, ``flush``
+joins everything into one string and hands it to the sink in a single
+call, so a turn is one write to the terminal or one send on a socket
+however much text it produced.  A sink is any callable taking that
+string: ``stdout``, a socket writer, ``list.append`` for a transcript,
+or several of them at once through ``tee``.
+
+Narrative text is written as long unwrapped lines.  A session that knows
+its player's terminal width says through ``Wrapped``, which wraps each
+line to fit.  Wrapping goes through ``RENDERED``, one LRU cache per
+process keyed by (text, width), so the scene menus and stock lines every
+player sees are wrapped once per width, not once per turn per player.
+Strings written in the code are the same object every time they're
+said and keep their hash, so a hit costs one dict lookup.
+"""
+import sys
+from collections import OrderedDict
+
+# wrapped texts kept per process
+CACHE_SIZE = 4096
+
+
+def render(lines, prompt=""):
+    """Join a turn's worth of output the way print() would have."""
+    return "".join(line + "\n" for line in lines) + prompt
+
+
+def stdout(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def tee(*sinks):
+    """A sink that passes each turn to every one of ``sinks``."""
+
+    def write(text):
+        for sink in sinks:
+            sink(text)
+
+    return write
+
+
+class RenderCache:
+    """A bounded LRU of rendered text, with hit and miss counters."""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        text = self.entries.get(key)
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return text
+
+    def put(self, key, text):
+        self.entries[key] = text
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+# shared by every session in the process
+RENDERED = RenderCache()
+
+
+def _wrap_line(line, width):
+    if len(line) <= width:
+        return [line]
+    # only on a miss, so importing this module stays cheap
+    import textwrap
+
+    # menu entries keep their dash hanging out on the left
+    indent = "  " if line.startswith("- ") else ""
+    return textwrap.wrap(line, width, subsequent_indent=indent, break_on_hyphens=False) or [""]
+
+
+def wrap(text, width):
+    """``text`` with every line longer than ``width`` wrapped to fit."""
+    if len(text) <= width:
+        return text
+    key = (text, width)
+    wrapped = RENDERED.get(key)
+    if wrapped is None:
+        wrapped = "\n".join(part for line in text.split("\n") for part in _wrap_line(line, width))
+        RENDERED.put(key, wrapped)
+    return wrapped
+
+
+class Wrapped:
+    """A ``say`` that wraps what it's given to ``width`` before passing it on."""
+
+    __slots__ = ("say", "width")
+
+    def __init__(self, say, width):
+        self.say = say
+        self.width = width
+
+    def __call__(self, text):
+        self.say(wrap(text, self.width))
+
+
+class TurnBuffer:
+    """One session's pending output, flushed to ``sink`` once per turn."""
+
+    __slots__ = ("lines", "say", "sink")
+
+    def __init__(self, sink=stdout):
+        self.lines = []
+        # handed to GameState as its say
+        self.say = self.lines.append
+        self.sink = sink
+
+    def flush(self, prompt=""):
+        """Write everything said since the last flush, then ``prompt``."""
+        text = render(self.lines, prompt)
+        self.lines.clear()
+        self.sink(text)
+        return text
@@ -0,0 +1,148 @@
+"""Opt-in timing of scene actions and enter hooks.
+
+    python game.py --profile                  # print the table when the game ends
+    python game.py --cprofile prof/           # ... and save a cProfile per action
+    python server.py --profile                # kill -USR1 <pid> logs the table
+
+Off by default, and off costs one global check per call: the two call
+sites in game.py only look at ``game.PROFILER`` and call straight
+through while it's None.  ``enable`` installs a ``Profiler`` that
+counts and times every choice callable and every ``on_enter`` hook, per
+scene and per command, and ``report`` or ``dump`` can be asked for at
+any time while sessions keep playing.
+
+Times are inclusive: an action that moves Travis on includes the next
+scene's enter hook, which is also counted on its own line.  Actions and
+hooks that are generators (fights, the karaoke) are timed over every
+resume, so the time spent waiting for the player never counts.
+"""
+import os
+import time
+from types import GeneratorType
+
+import game
+
+
+class Timing:
+    """Calls, total time and the slowest single run (or resume) for one key."""
+
+    __slots__ = ("calls", "total", "worst", "profile")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.worst = 0.0
+        # a cProfile.Profile, when captures are on
+        self.profile = None
+
+    def add(self, elapsed):
+        self.total += elapsed
+        if elapsed > self.worst:
+            self.worst = elapsed
+
+
+class Profiler:
+    """Where the time goes, keyed by ``(scene, command)``.
+
+    With ``capture`` on, each key also gets its own ``cProfile`` capture.
+    Only the outermost call is captured, since one profiler can't run
+    inside another; a nested enter hook shows up in its action's capture.
+    """
+
+    def __init__(self, capture=False):
+        self.capture = capture
+        self.timings = {}
+        self.capturing = False
+
+    def timing(self, scene, command):
+        timing = self.timings.get((scene, command))
+        if timing is None:
+            timing = self.timings[scene, command] = Timing()
+            if self.capture:
+                import cProfile
+
+                timing.profile = cProfile.Profile()
+        return timing
+
+    def _run(self, timing, func, *args):
+        profile = None
+        if timing.profile is not None and not self.capturing:
+            profile = timing.profile
+            self.capturing = True
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timing.add(time.perf_counter() - start)
+            if profile is not None:
+                profile.disable()
+                self.capturing = False
+
+    def call(self, scene, command, func, state):
+        """Run ``func(state)`` for ``command`` in ``scene`` and time it."""
+        timing = self.timing(scene, command)
+        timing.calls += 1
+        result = self._run(timing, func, state)
+        if isinstance(result, GeneratorType):
+            return self._resumes(timing, result)
+        return result
+
+    def _resumes(self, timing, hook):
+        reply = None
+        while True:
+            try:
+                prompt = self._run(timing, hook.send, reply)
+            except StopIteration as done:
+                return done.value
+            reply = yield prompt
+
+    def rows(self):
+        """``(scene, command, calls, total s, worst s)``, most time first."""
+        return sorted(
+            (
+                (scene, command, timing.calls, timing.total, timing.worst)
+                for (scene, command), timing in self.timings.items()
+            ),
+            key=lambda row: -row[3],
+        )
+
+    def report(self, limit=None):
+        lines = [f"{'scene':<26}{'command':<22}{'calls':>8}{'total ms':>11}{'mean us':>10}{'worst us':>10}"]
+        for scene, command, calls, total, worst in self.rows()[:limit]:
+            lines.append(
+                f"{scene:<26}{command:<22}{calls:>8}{total * 1e3:>11.2f}"
+                f"{total / calls * 1e6:>10.1f}{worst * 1e6:>10.1f}"
+            )
+        return "\n".join(lines)
+
+    def dump(self, directory):
+        """Write every cProfile capture to ``directory`` as ``scene.command.prof``.
+
+        Returns the paths written; open them with ``pstats`` or snakeviz.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for (scene, command), timing in self.timings.items():
+            if timing.profile is None:
+                continue
+            name = "_".join("".join(c if c.isalnum() else " " for c in command).split())
+            path = os.path.join(directory, f"{scene}.{name}.prof")
+            timing.profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def reset(self):
+        self.timings.clear()
+
+
+def enable(capture=False):
+    """Start timing every action and enter hook; returns the ``Profiler``."""
+    game.PROFILER = Profiler(capture)
+    return game.PROFILER
+
+
+def disable():
+    """Stop timing and hand back what was recorded, if anything."""
+    profiler, game.PROFILER = game.PROFILER, None
+    return profiler
@@ -0,0 +1,173 @@
+"""Recording sessions and replaying them at full speed.
+
+    python game.py --seed 42 --record run.json     # play, keeping every line typed
+    python server.py --record-dir recordings/      # keep every network session
+    python replay.py run.json recordings/*.json    # re-run them and check the output
+    python replay.py --times 1000 run.json         # ... over and over, for timing
+
+A recording is the session's seed, its starting scene, every line the
+player sent and a short digest of each turn's output, where a turn is
+everything shown up to and including the next prompt.  Each session
+rolls its own dice from its seed, so feeding the same lines back in
+has to reproduce the same output byte for byte; replaying does that
+with no terminal or socket in the way and reports the first turn that
+came out different.  A session played with pictures on is replayed with
+them on too, so it needs NumPy, Pillow and the same assets.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import sys
+import time
+
+from output import TurnBuffer
+
+VERSION = 1
+
+
+def digest(text):
+    """A short fingerprint of one turn's output."""
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class Recorder:
+    """Collects one session's input lines and output digests as it's played."""
+
+    def __init__(self, seed, start="trailer", width=None, art=False):
+        self.seed = seed
+        self.start = start
+        # the width output was wrapped to from the start, if any
+        self.width = width
+        # whether the session showed pictures
+        self.art = art
+        self.inputs = []
+        self.turns = []
+
+    def output(self, text):
+        self.turns.append(digest(text))
+
+    def input(self, line):
+        self.inputs.append(line)
+
+    def to_dict(self):
+        return {
+            "version": VERSION,
+            "seed": self.seed,
+            "start": self.start,
+            "width": self.width,
+            "art": self.art,
+            "inputs": self.inputs,
+            "turns": self.turns,
+        }
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file)
+
+
+def load(path):
+    """Read a recording saved by ``Recorder.save``."""
+    with open(path) as file:
+        recording = json.load(file)
+    if recording.get("version") != VERSION:
+        raise ValueError(f"{path}: unsupported recording version {recording.get('version')}")
+    return recording
+
+
+_renderer = None
+
+
+def _art():
+    global _renderer
+    if _renderer is None:
+        from art import ArtRenderer
+
+        _renderer = ArtRenderer()
+    return _renderer
+
+
+def replay(recording, scenes=None):
+    """Play ``recording``'s inputs back and return each turn's output.
+
+    A recording that runs out of input before the game ends was a
+    player who hung up, so the replay stops there too.
+    """
+    # imported here because game.py imports this module for --record
+    import game
+
+    turns = []
+    out = TurnBuffer(turns.append)
+    state = game.GameState(
+        scenes or game.get_scenes(),
+        recording["start"],
+        say=out.say,
+        seed=recording["seed"],
+        width=recording.get("width"),
+        art=_art() if recording.get("art") else None,
+    )
+    session = game.play_session(state)
+    inputs = iter(recording["inputs"])
+    try:
+        prompt = next(session)
+        while True:
+            out.flush(prompt)
+            line = next(inputs, None)
+            if line is None:
+                break
+            prompt = session.send(line)
+    except StopIteration:
+        out.flush()
+    return turns
+
+
+def verify(recording, scenes=None):
+    """Replay ``recording`` and compare it with what was recorded.
+
+    Returns ``None`` when every turn matches, otherwise ``(turn, text)``
+    for the first turn that differs; ``text`` is what the replay
+    printed there, or ``None`` if it ran out of turns first.
+    """
+    turns = replay(recording, scenes)
+    pairs = itertools.zip_longest(recording["turns"], turns)
+    for turn, (expected, text) in enumerate(pairs):
+        if expected is None or text is None or digest(text) != expected:
+            return turn, text
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded sessions and check their output.")
+    parser.add_argument("paths", nargs="+", metavar="recording")
+    parser.add_argument("--times", type=int, default=1, help="replay each recording this many times")
+    args = parser.parse_args(argv)
+
+    import game
+
+    scenes = game.get_scenes()
+    recordings = [(path, load(path)) for path in args.paths]
+    failed = 0
+    turns = 0
+    start = time.perf_counter()
+    for _ in range(args.times):
+        for path, recording in recordings:
+            mismatch = verify(recording, scenes)
+            turns += len(recording["turns"])
+            if mismatch is None:
+                continue
+            failed += 1
+            turn, text = mismatch
+            print(f"{path}: output differs at turn {turn}")
+            if text is not None:
+                print(text)
+    elapsed = time.perf_counter() - start
+    runs = args.times * len(recordings)
+    print(
+        f"{runs - failed}/{runs} replays matched in {elapsed:.2f} s "
+        f"({runs / elapsed:.0f} sessions/s, {turns / elapsed:.0f} turns/s)"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
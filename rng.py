@@ -0,0 +1,66 @@
+"""A per-session random stream that's cheap to keep and to save.
+
+``random.Random`` drags 2.5 KB of Mersenne Twister state around, which
+is more than the rest of a session put together and no good when a
+snapshot of a player should fit in a few dozen bytes.  ``SessionRng``
+is splitmix64: the whole state is one 64-bit integer.  It offers the
+handful of ``random.Random`` methods the game uses.
+"""
+import itertools
+import os
+
+MASK = (1 << 64) - 1
+
+
+class SessionRng:
+    """splitmix64 with ``randint``, ``choice`` and ``random``."""
+
+    __slots__ = ("state",)
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = new_seed()
+        self.state = seed & MASK
+
+    def next64(self):
+        self.state = s = (self.state + 0x9E3779B97F4A7C15) & MASK
+        z = ((s ^ (s >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+        return z ^ (z >> 31)
+
+    def randint(self, a, b):
+        # multiply-shift range reduction; the bias is below 2**-59 for dice
+        return a + ((self.next64() * (b - a + 1)) >> 64)
+
+    def choice(self, seq):
+        return seq[(self.next64() * len(seq)) >> 64]
+
+    def random(self):
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state
+
+    def __repr__(self):
+        return f"SessionRng(state={self.state:#018x})"
+
+
+def new_seed():
+    """A fresh seed for a session that wasn't given one."""
+    return next(_seeds) & MASK
+
+
+def _reseed():
+    global _seeds
+    _seeds = itertools.count(int.from_bytes(os.urandom(8), "little"))
+
+
+# Unseeded sessions count up from one random starting point, which is far
+# cheaper than a trip to os.urandom per session.  splitmix64 scrambles its
+# state on every draw, so neighbouring seeds still give unrelated streams.
+# Forked workers pick a new starting point so they don't repeat the parent.
+_reseed()
+os.register_at_fork(after_in_child=_reseed)
@@ -0,0 +1,233 @@
+"""Line-protocol game server: one ``GameState`` per TCP connection.
+
+Every connection plays its own game.  The game loop in game.py is a
+generator that yields prompts, so a player's turn here is just "send the
+buffered output plus the prompt, await a line, send it into the loop".
+No prompt ever blocks the event loop, and a player who types slowly (or
+reads slowly) only ever holds up their own coroutine.
+
+    python server.py --port 4000
+    nc localhost 4000
+
+With ``--profile`` every action and enter hook is timed (see
+profiling.py) and ``kill -USR1`` on the server logs the table, plus
+cProfile captures into ``--cprofile DIR`` if that was given.  With
+``--latency PATH`` every turn's latency goes into per-command
+histograms (see latency.py), written to PATH every ``--latency-interval``
+seconds and logged on SIGUSR1 too.  SIGUSR1 always logs how the shared
+text-wrapping cache is doing; players pick their width with "width N".
+With ``--reload`` edits to the world's data files are picked up while
+players play (see hotreload.py), and SIGUSR1 logs what that cost.
+With ``--journal DIR`` every session keeps a log there that a crashed
+server's players can be recovered from (see journal.py).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import time
+
+import game
+from output import RENDERED, TurnBuffer, tee
+from latency import Latency, command_label
+from replay import Recorder
+from rng import new_seed
+
+log = logging.getLogger("swamp.server")
+
+# players who go quiet this long get dropped
+IDLE_TIMEOUT = 15 * 60
+# room for a big crowd all piling in at once
+BACKLOG = 4096
+
+
+async def handle(
+    reader, writer, scenes, idle_timeout=IDLE_TIMEOUT, record_dir=None, latency=None, reloader=None,
+    journals=None,
+):
+    """Play one game over one connection until the player quits or leaves.
+
+    With ``record_dir`` set, the session is saved there for replay.py
+    when the connection closes, named after its seed.  Each turn's time
+    from line in to output out goes into ``latency``, if there is one.
+    With a ``reloader``, the session starts in its current world instead
+    of ``scenes`` and moves to each newer one at the menu after it lands.
+    With ``journals``, every change to the session is logged there until
+    it ends.
+    """
+    peer = writer.get_extra_info("peername")
+    seed = new_seed()
+    recorder = Recorder(seed) if record_dir else None
+
+    def send(text):
+        writer.write(text.encode())
+
+    out = TurnBuffer(tee(send, recorder.output) if recorder else send)
+    state = journal = None
+    try:
+        if reloader:
+            scenes = reloader.scenes
+        state = game.GameState(scenes, "trailer", say=out.say, seed=seed)
+        if reloader:
+            reloader.join(state)
+        if journals:
+            journal = state.journal = journals.open(f"{seed:016x}")
+        session = game.play_session(state)
+        prompt = next(session)
+        turn = None
+        while True:
+            if journal and prompt == game.MENU_PROMPT:
+                journal.commit(state)
+            out.flush(prompt)
+            if turn:
+                scene, command, start = turn
+                latency.record(scene, command, time.perf_counter() - start)
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), idle_timeout)
+            if not line:
+                break
+            if latency:
+                start = time.perf_counter()
+            line = line.decode("utf-8", "replace").rstrip("\r\n")
+            if latency:
+                scene = state.current_scene
+                turn = scene.name, command_label(scene, prompt, line, game.MENU_PROMPT), start
+            if recorder:
+                recorder.input(line)
+            if reloader and prompt == game.MENU_PROMPT:
+                if reloader.refresh(state) and journal:
+                    # the move renumbered its scenes and items under the journal
+                    journals.moved(journal, state)
+            prompt = session.send(line)
+    except StopIteration:
+        out.flush()
+        await writer.drain()
+    except asyncio.TimeoutError:
+        log.info("%s idled out", peer)
+    except (ConnectionError, ValueError) as exc:
+        # ValueError is what readline() raises for an overlong line
+        log.info("%s dropped: %s", peer, exc)
+    except Exception:
+        log.exception("session for %s crashed", peer)
+    finally:
+        if reloader and state is not None:
+            reloader.leave(state)
+        if journal:
+            journals.close(journal)
+        if recorder:
+            recorder.save(os.path.join(record_dir, f"{seed:016x}.json"))
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(
+    host="127.0.0.1", port=4000, idle_timeout=IDLE_TIMEOUT, record_dir=None, latency=None, reloader=None,
+    journals=None,
+):
+    """Start listening and return the ``asyncio.Server``."""
+    scenes = game.get_scenes()
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+    return await asyncio.start_server(
+        lambda reader, writer: handle(
+            reader, writer, scenes, idle_timeout, record_dir, latency, reloader, journals
+        ),
+        host,
+        port,
+        backlog=BACKLOG,
+    )
+
+
+def _dump(profiler, directory, latency, reloader):
+    if profiler:
+        log.info("profile:\n%s", profiler.report())
+        if directory:
+            log.info("wrote %d cProfile captures to %s", len(profiler.dump(directory)), directory)
+    if latency:
+        log.info("turn latency:\n%s", latency.report())
+    stats = RENDERED.stats()
+    log.info(
+        "text wrapping: %d cached, %d hits, %d misses (%.1f%%), %d evicted",
+        stats["entries"], stats["hits"], stats["misses"], stats["hit_rate"] * 100, stats["evictions"],
+    )
+    if reloader:
+        log.info("world reloads:\n%s", reloader.report())
+
+
+async def _write_latency(latency, path, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            latency.write(path)
+        except OSError:
+            log.exception("couldn't write %s", path)
+
+
+async def _main(args):
+    profiler = latency = reloader = journals = None
+    # the background loops, kept so they can be stopped on the way out
+    tasks = []
+    if args.profile or args.cprofile:
+        import profiling
+
+        profiler = profiling.enable(capture=bool(args.cprofile))
+    if args.latency:
+        latency = Latency(args.slo_ms / 1e3)
+        tasks.append(asyncio.create_task(_write_latency(latency, args.latency, args.latency_interval)))
+    if args.reload:
+        from hotreload import Reloader
+
+        # before serve(), so the world it hands out is the one being watched
+        reloader = Reloader()
+        tasks.append(asyncio.create_task(reloader.watch(args.reload)))
+    if args.journal:
+        from journal import Journals
+
+        journals = Journals(args.journal)
+        tasks.append(asyncio.create_task(journals.watch(args.journal_interval)))
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGUSR1, _dump, profiler, args.cprofile, latency, reloader
+    )
+    server = await serve(
+        args.host, args.port, args.idle_timeout, args.record_dir, latency, reloader, journals
+    )
+    for sock in server.sockets:
+        log.info("serving swamp on %s", sock.getsockname())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Travis Vaelen over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    parser.add_argument("--record-dir", help="save every session here for replay.py")
+    parser.add_argument("--profile", action="store_true", help="time every action; SIGUSR1 logs it")
+    parser.add_argument("--cprofile", metavar="DIR", help="... and dump cProfile captures here on SIGUSR1")
+    parser.add_argument("--latency", metavar="PATH", help="write turn latency histograms here (Prometheus text)")
+    parser.add_argument("--latency-interval", type=float, default=15.0, help="seconds between writes")
+    parser.add_argument("--slo-ms", type=float, default=50.0, help="turn latency SLO threshold")
+    parser.add_argument("--reload", type=float, nargs="?", const=1.0, metavar="SECONDS",
+                        help="pick up edits to the world's data files, looking this often")
+    parser.add_argument("--journal", metavar="DIR", help="log every session here to recover it after a crash")
+    parser.add_argument("--journal-interval", type=float, default=1.0, help="seconds between batched writes")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Serving on every core: one supervisor, N forked workers, one shared world.
+
+    python shard.py --port 4000 --workers 4
+    kill -USR1 <supervisor pid>                   # log each worker's memory
+    python shard.py --scale 1,2,4 --players 400   # turns/s and RSS per worker count
+
+A single server.py process tops out at one core.  Here the supervisor
+builds the scene world once, freezes it and forks the workers, so every
+worker reads the same scene descriptions, menus and closures out of
+pages it shares copy-on-write with the supervisor.  ``gc.freeze()``
+moves everything alive at fork time into a generation the collector
+never walks, which keeps collections in the workers from writing to
+(and so copying) those pages.  Reference counts still change as the
+scenes are used, so some shared pages do get copied; the memory table
+shows how many, as private versus shared and as PSS.
+
+The supervisor only accepts.  Each connection is handed over as a file
+descriptor to one worker, chosen by a hash of the client's address, and
+stays there for its whole session: the game state never leaves the
+process it started in.  With ``--affinity host`` every connection from
+one client lands on the same worker.  A worker that dies is forked again
+in its slot, from the same frozen world, so the routing doesn't shift.
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import time
+import zlib
+
+import game
+import server
+
+log = logging.getLogger("swamp.shard")
+
+# what's read out of /proc/<pid>/smaps_rollup, in kB
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+# how often the supervisor looks for workers that died
+REAP_INTERVAL = 1.0
+
+
+def memory(pid):
+    """``{field: kB}`` for ``pid`` from smaps_rollup, or None off Linux."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return None
+    found = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name in MEMORY_FIELDS:
+            found[name] = int(value.split()[0])
+    return found
+
+
+def memory_report(pids):
+    """A table of each process' memory, in MB."""
+    lines = [f"{'process':<12}{'pid':>8}" + "".join(f"{field:>15}" for field in MEMORY_FIELDS)]
+    for name, pid in pids:
+        found = memory(pid)
+        if found is None:
+            lines.append(f"{name:<12}{pid:>8}   (no smaps_rollup)")
+            continue
+        lines.append(
+            f"{name:<12}{pid:>8}" + "".join(f"{found.get(field, 0) / 1024:>15.1f}" for field in MEMORY_FIELDS)
+        )
+    return "\n".join(lines)
+
+
+def route(peer, workers, affinity="connection"):
+    """Which worker slot a connection from ``peer`` goes to."""
+    key = peer[0] if affinity == "host" else f"{peer[0]}:{peer[1]}"
+    return zlib.crc32(key.encode()) % workers
+
+
+async def _session(fd, scenes, idle_timeout, record_dir):
+    sock = socket.socket(fileno=fd)
+    sock.setblocking(False)
+    reader, writer = await asyncio.open_connection(sock=sock)
+    await server.handle(reader, writer, scenes, idle_timeout, record_dir)
+
+
+async def _work(control, scenes, idle_timeout, record_dir):
+    """Play every connection the supervisor hands over until it goes away."""
+    loop = asyncio.get_running_loop()
+    gone = loop.create_future()
+    sessions = set()
+
+    def receive():
+        try:
+            _, fds, _, _ = socket.recv_fds(control, 1, 1)
+        except BlockingIOError:
+            return
+        if not fds:
+            # the supervisor hung up: take no more players, finish these ones
+            loop.remove_reader(control.fileno())
+            gone.set_result(None)
+            return
+        for fd in fds:
+            task = loop.create_task(_session(fd, scenes, idle_timeout, record_dir))
+            sessions.add(task)
+            task.add_done_callback(sessions.discard)
+
+    loop.add_reader(control.fileno(), receive)
+    await gone
+    if sessions:
+        await asyncio.wait(sessions)
+
+
+class Supervisor:
+    """Forks the workers, accepts connections and hands them out."""
+
+    def __init__(self, listener, workers, scenes, idle_timeout, record_dir, affinity="connection"):
+        self.listener = listener
+        self.scenes = scenes
+        self.idle_timeout = idle_timeout
+        self.record_dir = record_dir
+        self.affinity = affinity
+        # per slot: (pid, our end of its control socket)
+        self.slots = [None] * workers
+        self.routed = [0] * workers
+
+    def spawn(self, slot):
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                ours.close()
+                self.listener.close()
+                for other in self.slots:
+                    if other:
+                        other[1].close()
+                for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGUSR1, signal.SIGCHLD):
+                    signal.signal(signum, signal.SIG_DFL)
+                gc.enable()
+                theirs.setblocking(False)
+                asyncio.run(_work(theirs, self.scenes, self.idle_timeout, self.record_dir))
+            except BaseException:
+                log.exception("worker %d crashed", slot)
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        theirs.close()
+        self.slots[slot] = (pid, ours)
+        log.info("worker %d is pid %d", slot, pid)
+
+    def reap(self):
+        """Fork a new worker for every slot whose worker has died."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            for slot, (worker, control) in enumerate(self.slots):
+                if worker == pid:
+                    log.warning("worker %d (pid %d) exited with status %d", slot, pid, status)
+                    control.close()
+                    self.spawn(slot)
+
+    def hand_over(self, conn, peer):
+        slot = route(peer, len(self.slots), self.affinity)
+        try:
+            socket.send_fds(self.slots[slot][1], [b"c"], [conn.fileno()])
+            self.routed[slot] += 1
+        except OSError:
+            log.exception("couldn't hand %s to worker %d", peer, slot)
+        finally:
+            conn.close()
+
+    def pids(self):
+        return [("supervisor", os.getpid())] + [
+            (f"worker {slot}", worker[0]) for slot, worker in enumerate(self.slots)
+        ]
+
+    def report(self):
+        routed = ", ".join(f"worker {slot}: {count}" for slot, count in enumerate(self.routed))
+        return f"connections routed: {routed}\n{memory_report(self.pids())}"
+
+    def run(self):
+        for slot in range(len(self.slots)):
+            self.spawn(slot)
+        stopping = False
+        wanted = []
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGUSR1, lambda signum, frame: wanted.append(True))
+        self.listener.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(self.listener, selectors.EVENT_READ)
+        try:
+            while not stopping:
+                if selector.select(REAP_INTERVAL):
+                    try:
+                        conn, peer = self.listener.accept()
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                    else:
+                        self.hand_over(conn, peer)
+                if wanted:
+                    wanted.clear()
+                    log.info("%s", self.report())
+                self.reap()
+        finally:
+            selector.close()
+            self.listener.close()
+            log.info("%s", self.report())
+            # hanging up tells each worker to finish its games and exit
+            for pid, control in self.slots:
+                control.close()
+            for pid, _ in self.slots:
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+
+
+def prepare(freeze=True):
+    """Build everything the workers share, then freeze it for forking."""
+    # no collections from here to the fork: they'd only dirty the pages
+    # we're about to share
+    gc.disable()
+    scenes = game.get_scenes()
+    if freeze:
+        gc.freeze()
+    return scenes
+
+
+def _children(pid):
+    """The pids whose parent is ``pid``."""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # the command name can hold spaces, so count from after it
+        if int(stat.rpartition(")")[2].split()[1]) == pid:
+            found.append(int(entry))
+    return found
+
+
+def _wait_listening(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"nothing listening on {host}:{port}")
+
+
+def scale(counts, args):
+    """Run the load generator against 1, 2, ... workers and tabulate it."""
+    import loadgen
+
+    rows = []
+    for count in counts:
+        command = [
+            sys.executable, os.path.abspath(__file__), "--host", args.host, "--port", str(args.port),
+            "--workers", str(count), "--idle-timeout", "60",
+        ]
+        if args.no_freeze:
+            command.append("--no-freeze")
+        supervisor = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+        try:
+            _wait_listening(args.host, args.port)
+            load = argparse.Namespace(
+                host=args.host, port=args.port, players=args.players, duration=args.duration,
+                ramp=min(2.0, args.duration / 4), think_scale=args.think_scale, timeout=30.0, seed=1,
+            )
+            results, elapsed = asyncio.run(loadgen.run(load, {"speedrunner": 1, "wanderer": 1}))
+            # the workers' pages stay mapped after their players leave
+            workers = [memory(pid) or {} for pid in _children(supervisor.pid)]
+        finally:
+            supervisor.send_signal(signal.SIGTERM)
+            supervisor.wait()
+        total = loadgen.Stats()
+        for stats in results.values():
+            total.latency.merge(stats.latency)
+            total.errors += stats.errors
+        rss = [found.get("Rss", 0) / 1024 for found in workers]
+        pss = [found.get("Pss", 0) / 1024 for found in workers]
+        private = [found.get("Private_Dirty", 0) / 1024 for found in workers]
+        p99 = total.latency.quantile(0.99) * 1e3
+        rows.append((count, total.turns / elapsed, p99, total.errors, rss, pss, private))
+
+    print(
+        f"{'workers':>8}{'turns/s':>10}{'p99 ms':>9}{'errors':>8}"
+        f"{'RSS MB':>10}{'PSS MB':>10}{'private MB':>12}   (per worker, mean)"
+    )
+    for count, rate, p99, errors, rss, pss, private in rows:
+        def mean(values):
+            return sum(values) / len(values) if values else 0.0
+
+        print(
+            f"{count:>8}{rate:>10.0f}{p99:>9.2f}{errors:>8}"
+            f"{mean(rss):>10.1f}{mean(pss):>10.1f}{mean(private):>12.1f}"
+        )
+    return 1 if any(row[3] for row in rows) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Travis Vaelen on several worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--affinity", choices=("connection", "host"), default="connection",
+                        help="pin each connection, or every connection from one host, to a worker")
+    parser.add_argument("--idle-timeout", type=float, default=server.IDLE_TIMEOUT)
+    parser.add_argument("--record-dir", help="save every session here for replay.py")
+    parser.add_argument("--no-freeze", action="store_true", help="skip gc.freeze(), to compare memory")
+    parser.add_argument("--scale", metavar="N,N,...", help="measure turns/s and memory at each worker count")
+    parser.add_argument("--players", type=int, default=200, help="bot players for --scale")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per worker count for --scale")
+    parser.add_argument("--think-scale", type=float, default=0.0, help="bot think times for --scale")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(message)s")
+
+    if args.scale:
+        return scale([int(count) for count in args.scale.split(",")], args)
+    if args.workers < 1:
+        parser.error("need at least one worker")
+    if args.record_dir:
+        os.makedirs(args.record_dir, exist_ok=True)
+    listener = socket.create_server((args.host, args.port), backlog=server.BACKLOG)
+    scenes = prepare(freeze=not args.no_freeze)
+    log.info("serving swamp on %s with %d workers", listener.getsockname(), args.workers)
+    Supervisor(listener, args.workers, scenes, args.idle_timeout, args.record_dir, args.affinity).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
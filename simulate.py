@@ -0,0 +1,198 @@
+"""Headless Monte Carlo simulator for the boss fights in game.py.
+
+Runs big batches of fights at once with NumPy instead of one ``input()``
+at a time, so difficulty tuning doesn't mean playing Lot Lizard by hand
+a hundred times.  Every fight follows the same rules as its hand-written
+loop in game.py:
+
+- lot_lizard: 3 HP each, a 12+ hits, anything else costs Travis 1 HP.
+- meth_zombie: three waves of 2 HP zombies, zombie HP resets each wave,
+  Travis' 3 HP carries over.
+- mole_cricket: 5 HP boss, 14+ hits, 8+ grazes, anything lower gets
+  Travis BOGGED and his next turn is lost along with 1 HP.
+- water_bug: 4 HP boss that goes down at 1, 13+ hits, a miss is a coin
+  flip between a slap (1 HP) and a Toxic Twerk that makes Travis' next
+  move a random one.
+
+Run ``python simulate.py --help`` for the knobs.
+"""
+import argparse
+import time
+
+import numpy as np
+
+MOVES = ("flex", "flirt", "yeehaw")
+DEFAULT_STATS = {"flex": 2, "flirt": 3, "yeehaw": 1}
+POLICIES = ("best", "random") + MOVES
+FIGHTS = ("lot_lizard", "meth_zombie", "mole_cricket", "water_bug")
+
+# fights are simulated in slices this big so a 100M run doesn't eat all the RAM
+CHUNK = 1 << 20
+
+
+def make_policy(name, stats):
+    """Return a function ``(rng, k) -> move indices`` for a move policy."""
+    if name == "random":
+        return lambda rng, k: rng.integers(0, 3, k)
+    if name == "best":
+        name = max(MOVES, key=lambda move: stats[move])
+    if name not in MOVES:
+        raise ValueError(f"unknown policy {name!r}")
+    index = MOVES.index(name)
+    return lambda rng, k: np.full(k, index, dtype=np.int64)
+
+
+def _rolls(rng, k, mods, moves):
+    return rng.integers(1, 21, k) + mods[moves]
+
+
+def sim_lot_lizard(n, mods, policy, rng):
+    boss = np.full(n, 3, dtype=np.int8)
+    hp = np.full(n, 3, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int32)
+    live = np.arange(n)
+    while live.size:
+        hit = _rolls(rng, live.size, mods, policy(rng, live.size)) >= 12
+        boss[live] -= hit
+        hp[live] -= ~hit
+        turns[live] += 1
+        live = live[(boss[live] > 0) & (hp[live] > 0)]
+    return boss <= 0, turns, hp
+
+
+def sim_meth_zombie(n, mods, policy, rng):
+    wave = np.ones(n, dtype=np.int8)
+    zombie = np.full(n, 2, dtype=np.int8)
+    hp = np.full(n, 3, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int32)
+    live = np.arange(n)
+    while live.size:
+        hit = _rolls(rng, live.size, mods, policy(rng, live.size)) >= 12
+        zombie[live] -= hit
+        hp[live] -= ~hit
+        turns[live] += 1
+        # a fresh 2 HP zombie lurches out of the smoke for the next wave
+        cleared = live[zombie[live] <= 0]
+        wave[cleared] += 1
+        zombie[cleared] = 2
+        live = live[(wave[live] <= 3) & (hp[live] > 0)]
+    return wave > 3, turns, hp
+
+
+def sim_mole_cricket(n, mods, policy, rng):
+    boss = np.full(n, 5, dtype=np.int8)
+    hp = np.full(n, 3, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int32)
+    bogged = np.zeros(n, dtype=bool)
+    live = np.arange(n)
+    while live.size:
+        turns[live] += 1
+        dazed = bogged[live]
+        lost = live[dazed]
+        hp[lost] -= 1
+        bogged[lost] = False
+        acting = live[~dazed]
+        total = _rolls(rng, acting.size, mods, policy(rng, acting.size))
+        boss[acting] -= total >= 14
+        bogged[acting] = total < 8
+        live = live[(boss[live] > 0) & (hp[live] > 0)]
+    return boss <= 0, turns, hp
+
+
+def sim_water_bug(n, mods, policy, rng):
+    boss = np.full(n, 4, dtype=np.int8)
+    hp = np.full(n, 3, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int32)
+    confused = np.zeros(n, dtype=bool)
+    live = np.arange(n)
+    while live.size:
+        k = live.size
+        # a twerked Travis flails with a random move instead of the policy's
+        moves = np.where(confused[live], rng.integers(0, 3, k), policy(rng, k))
+        confused[live] = False
+        hit = _rolls(rng, k, mods, moves) >= 13
+        twerk = ~hit & (rng.random(k) < 0.5)
+        boss[live] -= hit
+        hp[live] -= ~hit & ~twerk
+        confused[live] = twerk
+        turns[live] += 1
+        live = live[(boss[live] > 1) & (hp[live] > 0)]
+    return hp > 0, turns, hp
+
+
+SIMULATORS = {
+    "lot_lizard": sim_lot_lizard,
+    "meth_zombie": sim_meth_zombie,
+    "mole_cricket": sim_mole_cricket,
+    "water_bug": sim_water_bug,
+}
+
+
+def simulate(fight, n, stats=None, policy="best", seed=None):
+    """Simulate ``n`` fights and return a summary dict.
+
+    The summary holds the win rate, mean turns per fight and the share of
+    fights ending with Travis at each HP value from 0 to 3.
+    """
+    stats = dict(DEFAULT_STATS, **(stats or {}))
+    mods = np.array([stats[move] for move in MOVES], dtype=np.int64)
+    choose = make_policy(policy, stats)
+    rng = np.random.default_rng(seed)
+    sim = SIMULATORS[fight]
+
+    wins = 0
+    turns = 0
+    hp_counts = np.zeros(4, dtype=np.int64)
+    done = 0
+    while done < n:
+        k = min(CHUNK, n - done)
+        won, fight_turns, hp = sim(k, mods, choose, rng)
+        wins += int(won.sum())
+        turns += int(fight_turns.sum())
+        hp_counts += np.bincount(np.clip(hp, 0, 3), minlength=4)
+        done += k
+    return {
+        "fight": fight,
+        "policy": policy,
+        "fights": n,
+        "win_rate": wins / n,
+        "mean_turns": turns / n,
+        "hp_left": (hp_counts / n).tolist(),
+    }
+
+
+def parse_stats(text):
+    """Parse ``flex=2,flirt=4`` style overrides into a dict."""
+    stats = {}
+    for part in filter(None, text.split(",")):
+        key, _, value = part.partition("=")
+        if key not in MOVES:
+            raise argparse.ArgumentTypeError(f"unknown stat {key!r}")
+        stats[key] = int(value)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate Travis' boss fights.")
+    parser.add_argument("-n", "--fights", type=int, default=1_000_000)
+    parser.add_argument("--fight", choices=FIGHTS, action="append")
+    parser.add_argument("--policy", choices=POLICIES, action="append")
+    parser.add_argument("--stats", type=parse_stats, default={})
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    print(f"{'fight':<13}{'policy':<8}{'win':>8}{'turns':>7}  hp left 0/1/2/3{'':>6}fights/s")
+    for fight in args.fight or FIGHTS:
+        for policy in args.policy or POLICIES:
+            start = time.perf_counter()
+            result = simulate(fight, args.fights, args.stats, policy, args.seed)
+            rate = args.fights / (time.perf_counter() - start)
+            spread = " ".join(f"{share:.3f}" for share in result["hp_left"])
+            print(
+                f"{fight:<13}{policy:<8}{result['win_rate']:>8.2%}"
+                f"{result['mean_turns']:>7.2f}  {spread}  {rate:>10,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
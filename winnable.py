@@ -0,0 +1,350 @@
+"""Can the game be finished?  A search over every state the world allows.
+
+    python winnable.py            # report, exit 1 if the ending can't be reached
+    python winnable.py --dead 3   # ... with three example dead ends per scene
+
+A state is what a snapshot holds between turns: scene, flags, item
+counts and stats, packed by ``snapshot.dump`` with the dice zeroed, so
+each one is a few dozen hashable bytes.  From every state the search
+tries each command the scene offers by running the real scene code on a
+restored copy, and remembers every state it has already expanded.
+
+Fights are probabilistic edges.  The dice are rigged to force a win or
+a loss and each branch carries the exact chance from ``odds.solve_spec``.
+Other prompts (Mole Cricket's stare-down, the karaoke) are answered
+with each reply in ``REPLIES``, or with the prompt itself and a wrong
+answer, and each answer is a branch.  A running hook can't be copied,
+so every branch replays its turn from the start.
+
+The report lists scenes no reachable state is in, dead ends (states
+from which the ending can't be reached any more), items Travis can
+never get his hands on and the fewest commands that win the game.
+"""
+import argparse
+import sys
+import time
+from collections import Counter, deque
+from collections.abc import Mapping
+from types import GeneratorType
+
+import combat
+import game
+import odds
+import snapshot
+
+START = "trailer"
+
+# the story only ever asks whether Travis has an item and takes one away
+# at a time, so every count above this plays out the same
+COUNT_CAP = 2
+
+# a turn that needs more answers than this is given up on
+MAX_ANSWERS = 32
+
+# what to try at a free-text prompt, by prompt; anything not listed gets
+# its own text echoed back (the karaoke) and one wrong answer
+REPLIES = {
+    "Your move?": ("flex lat spread", "run"),
+}
+WRONG = "uhh"
+
+_FIGHT = combat.fight.__code__
+
+
+def _quiet(text):
+    pass
+
+
+class RiggedDice:
+    """Stands in for ``SessionRng`` so a fight goes the way it's told."""
+
+    __slots__ = ("win",)
+
+    # what snapshot.dump records for the dice
+    state = 0
+
+    def __init__(self):
+        self.win = None
+
+    def _check(self):
+        if self.win is None:
+            raise RuntimeError("dice rolled outside a fight")
+
+    def randint(self, a, b):
+        self._check()
+        return b if self.win else a
+
+    def choice(self, seq):
+        self._check()
+        return seq[0]
+
+    def random(self):
+        # never a Toxic Twerk: a losing Travis just gets slapped
+        self._check()
+        return 0.99
+
+
+class _Entered(Mapping):
+    """The scene map, noting every scene a turn passes through.
+
+    It stands in for ``state.scenes``, so it's a whole mapping; only
+    fetching a scene counts as entering it, not listing or testing.
+    """
+
+    def __init__(self, scenes, names):
+        self.scenes = scenes
+        self.names = names
+
+    def __getitem__(self, name):
+        self.names.add(name)
+        return self.scenes[name]
+
+    def __contains__(self, name):
+        return name in self.scenes
+
+    def __iter__(self):
+        return iter(self.scenes)
+
+    def __len__(self):
+        return len(self.scenes)
+
+
+def _key(state):
+    items = state.items
+    for item, count in enumerate(items):
+        if count > COUNT_CAP:
+            items[item] = COUNT_CAP
+    return snapshot.dump(state)
+
+
+def _innermost(turn):
+    while isinstance(turn.gi_yieldfrom, GeneratorType):
+        turn = turn.gi_yieldfrom
+    return turn
+
+
+def _progress(state, hook):
+    """Where a turn stands at a prompt, to spot a hook that loops forever."""
+    frame = hook.gi_frame
+    names = tuple(sorted(
+        (name, value) for name, value in frame.f_locals.items() if isinstance(value, (int, str))
+    ))
+    return (
+        state.current_scene.name,
+        state.flags,
+        bytes(state.items),
+        tuple(state.stats().values()),
+        hook.gi_code,
+        frame.f_lasti,
+        names,
+    )
+
+
+def _replies(prompt):
+    prompt = prompt.strip()
+    return REPLIES.get(prompt, (prompt, WRONG))
+
+
+def _play(key, command, plan, entered):
+    """Replay ``command`` from ``key``, answering decisions from ``plan``.
+
+    Returns the key the turn ends in, the ``(answer, chance)`` options at
+    the first decision ``plan`` doesn't cover, or None for a turn that
+    goes round in circles.  Every scene the turn passes through is added
+    to ``entered``.
+    """
+    state = snapshot.load(key, say=_quiet)
+    state.rng = dice = RiggedDice()
+    state.scenes = _Entered(state.scenes, entered)
+    turn = game.take_turn(state, command)
+    fights = set()
+    seen = set()
+    answers = iter(plan)
+    try:
+        prompt = next(turn)
+        while True:
+            hook = _innermost(turn)
+            if hook.gi_code is _FIGHT:
+                reply = combat.MOVES[0]
+                if hook not in fights:
+                    answer = next(answers, None)
+                    if answer is None:
+                        fight = hook.gi_frame.f_locals
+                        win = odds.solve_spec(fight["spec"], fight["stats"]).win
+                        return [(won, chance) for won, chance in ((True, win), (False, 1 - win)) if chance]
+                    dice.win = answer[0]
+                    fights.add(hook)
+            else:
+                progress = _progress(state, hook)
+                if progress in seen or len(seen) >= MAX_ANSWERS:
+                    return None
+                seen.add(progress)
+                answer = next(answers, None)
+                if answer is None:
+                    return [(reply, 1) for reply in _replies(prompt)]
+                reply = answer[0]
+            prompt = turn.send(reply)
+    except StopIteration:
+        return _key(state)
+
+
+def outcomes(key, command, entered, plan=()):
+    """Every way ``command`` can turn out from ``key``, as ``(key, chance)``."""
+    result = _play(key, command, plan, entered)
+    if isinstance(result, list):
+        for answer in result:
+            yield from outcomes(key, command, entered, plan + (answer,))
+    elif result is not None:
+        chance = 1
+        for _, p in plan:
+            chance *= p
+        yield result, chance
+
+
+def describe(key):
+    """``"dirt_road [saw_gator] Gas Can x2"`` for a state key."""
+    state = snapshot.load(key, say=_quiet)
+    flags = [name for flag, name in game.FLAG_NAMES.items() if state.flags & flag]
+    items = [
+        name if count == 1 else f"{name} x{count}"
+        for name, count in zip(game.ITEM_NAMES, state.items) if count
+    ]
+    return f"{state.current_scene.name} [{', '.join(flags)}] {'; '.join(items)}"
+
+
+class Report:
+    """Everything the search found.
+
+    ``edges`` maps every reachable state to its ``(command, key, chance)``
+    moves, ``route`` is the shortest win as ``(scene, command, chance)``
+    steps, or None when the ending can't be reached at all.
+    """
+
+    def __init__(self, start, edges, parents, entered):
+        self.start = start
+        self.edges = edges
+        states = {key: snapshot.load(key, say=_quiet) for key in edges}
+        wins = [key for key in edges if states[key].finished]
+
+        entered = entered | {state.current_scene.name for state in states.values()}
+        self.unreachable = [name for name in game.get_scenes() if name not in entered]
+
+        held = bytearray(len(game.ITEM_NAMES))
+        for state in states.values():
+            for item, count in enumerate(state.items):
+                held[item] |= count
+        needed = {}
+        for spec in vars(game).values():
+            if isinstance(spec, combat.BossSpec):
+                for item in spec.requires:
+                    needed.setdefault(item, []).append(spec.name)
+        self.missing = {item: needed.get(item, []) for item, count in enumerate(held) if not count}
+
+        sources = {key: [] for key in edges}
+        for key, moves in edges.items():
+            for _, target, _ in moves:
+                sources[target].append(key)
+        winnable = set(wins)
+        queue = deque(wins)
+        while queue:
+            for source in sources[queue.popleft()]:
+                if source not in winnable:
+                    winnable.add(source)
+                    queue.append(source)
+        self.dead_ends = [key for key in edges if key not in winnable]
+        self.dead_end_scenes = Counter(states[key].current_scene.name for key in self.dead_ends)
+
+        self.route = None
+        if wins:
+            # parents come from a breadth-first search, so the first win found is the nearest
+            key = min(wins, key=parents.__getitem__)
+            steps = []
+            while key != start:
+                depth, source, command, chance = parents[key]
+                steps.append((states[source].current_scene.name, command, chance))
+                key = source
+            self.route = steps[::-1]
+
+    @property
+    def winnable(self):
+        return self.route is not None
+
+    @property
+    def route_chance(self):
+        chance = 1
+        for _, _, p in self.route:
+            chance *= p
+        return chance
+
+
+def solve(start=START):
+    """Explore every state reachable from a new game at ``start``."""
+    state = game.GameState(game.get_scenes(), start, say=_quiet)
+    state.rng = RiggedDice()
+    start_key = _key(state)
+    entered = set()
+    edges = {start_key: None}
+    # key -> (depth, previous key, command, chance) for the first way found in
+    parents = {start_key: (0,)}
+    queue = deque([start_key])
+    while queue:
+        key = queue.popleft()
+        state = snapshot.load(key, say=_quiet)
+        moves = edges[key] = []
+        if state.finished:
+            continue
+        depth = parents[key][0]
+        for command in state.current_scene.choices:
+            merged = {}
+            # answers are Travis' to pick, so keep the best way to each target
+            for target, chance in outcomes(key, command, entered):
+                merged[target] = max(merged.get(target, 0), chance)
+            for target, chance in merged.items():
+                if target == key:
+                    continue
+                moves.append((command, target, chance))
+                if target not in edges:
+                    edges[target] = None
+                    parents[target] = (depth + 1, key, command, chance)
+                    queue.append(target)
+    return Report(start_key, edges, parents, entered)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the game can be finished.")
+    parser.add_argument("--start", default=START)
+    parser.add_argument("--dead", type=int, default=0, metavar="N", help="show N dead ends per scene")
+    args = parser.parse_args(argv)
+
+    began = time.perf_counter()
+    report = solve(args.start)
+    elapsed = time.perf_counter() - began
+    moves = sum(map(len, report.edges.values()))
+    print(f"explored {len(report.edges)} states and {moves} moves in {elapsed:.2f}s")
+
+    if report.unreachable:
+        print(f"unreachable scenes: {', '.join(report.unreachable)}")
+    for item, bosses in report.missing.items():
+        need = f" (needed for {', '.join(bosses)})" if bosses else ""
+        print(f"never obtainable: {game.ITEM_NAMES[item]}{need}")
+    if report.dead_ends:
+        print(f"dead ends: {len(report.dead_ends)} states")
+        for scene, count in report.dead_end_scenes.most_common():
+            print(f"    {scene:<26} {count}")
+            if args.dead:
+                shown = [key for key in report.dead_ends if describe(key).startswith(scene + " ")]
+                for key in shown[:args.dead]:
+                    print(f"        {describe(key)}")
+
+    if not report.winnable:
+        print("the ending can't be reached")
+        return 1
+    print(f"shortest win: {len(report.route)} commands, {float(report.route_chance):.2%} chance the fights go his way")
+    for scene, command, chance in report.route:
+        odds_ = "" if chance == 1 else f"  ({float(chance):.2%})"
+        print(f"    {scene:<26} {command}{odds_}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,663 @@
+"""The swamp's content: data files compiled into one binary world image.
+
+    python world.py             # compile if the image is stale, then sum it up
+    python world.py --check     # exit 1 if the image is stale
+    python world.py --force     # compile no matter what
+
+Scenes, items, flags and boss fights are written in TOML under
+Travis_Vaelen/World; scenes.toml explains what a scene's steps can do.
+Compiling checks every name, resolves items to IDs and flags to bits,
+and marshals the result into one image under ~/.cache/swamp (or
+$SWAMP_WORLD_CACHE).  Startup maps that image and unmarshals it, so the
+data files aren't parsed at all.
+
+The image's header holds the size and mtime of every source file and
+a hash of their contents.  If the sizes and mtimes still match, the
+image is used as it is.  If only they changed (a checkout or a
+``touch``), the files are hashed, and a matching hash just gets the new
+mtimes written back.  Anything else compiles the world again.  Images
+are written to a temporary file and renamed, so a process starting up
+never reads half of one.
+
+Each step becomes a plain closure over its text and numbers, built once
+per process: a menu choice costs what the hand-written function it
+replaced did.
+"""
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+import time
+from types import MappingProxyType
+
+import combat
+import game
+
+WORLD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Travis_Vaelen", "World")
+SOURCES = ("items.toml", "bosses.toml", "scenes.toml")
+
+CACHE = os.environ.get("SWAMP_WORLD_CACHE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "swamp", "world.bin"
+)
+
+MAGIC = b"SWMPWRLD"
+VERSION = 1
+# magic, version, marshal version, the interpreter's cache tag (marshal
+# data is only promised to load in the Python that wrote it), a stamp of
+# the sources' sizes and mtimes, and a hash of their contents
+HEADER = struct.Struct("<8sBB16s32s32s")
+
+# what a step can say, in the order it does them
+EFFECTS = (
+    "art", "say", "describe", "inventory", "inventory_line",
+    "take", "give", "set", "clear", "stat", "move", "finish",
+)
+# what a step can end with; at most one per step
+RESULTS = ("go", "fight", "stare_down", "karaoke")
+STEP_KEYS = frozenset(("when", "else", "use") + EFFECTS + RESULTS)
+
+BOSS_FIELDS = frozenset((
+    "boss_hp", "hit", "travis_hp", "waves", "defeated_at", "graze", "on_miss", "intro", "menu",
+    "prompt", "invalid", "wave_intro", "wave_clear", "move_lines", "hit_lines", "graze_lines",
+    "miss_lines", "twerk_lines", "bogged_lines", "confused_line", "requires", "unready_lines",
+    "unready_scene", "win_lines", "loot", "win_flag", "win_scene", "lose_lines", "consolation",
+    "lose_scene",
+))
+
+
+def stamp(directory=WORLD_DIR):
+    """A digest of the source files' sizes and mtimes: cheap, and usually enough."""
+    digest = hashlib.sha256()
+    for name in SOURCES:
+        info = os.stat(os.path.join(directory, name))
+        digest.update(f"{name}:{info.st_size}:{info.st_mtime_ns}\n".encode())
+    return digest.digest()
+
+
+def source_digest(directory=WORLD_DIR):
+    digest = hashlib.sha256()
+    for name in SOURCES:
+        with open(os.path.join(directory, name), "rb") as file:
+            digest.update(f"{name}:".encode() + hashlib.sha256(file.read()).digest())
+    return digest.digest()
+
+
+class _Names:
+    """Looks names up for the compiler, saying where a bad one was."""
+
+    def __init__(self, flags, items, scenes, bosses):
+        self.flags = {name: 1 << bit for bit, name in enumerate(flags)}
+        self.items = {name: index for index, name in enumerate(items)}
+        self.scenes = frozenset(scenes)
+        self.bosses = frozenset(bosses)
+
+    def _find(self, table, kind, name, where):
+        if name not in table:
+            raise ValueError(f"{where}: unknown {kind} {name!r}")
+        return name
+
+    def flag_mask(self, names, where):
+        mask = 0
+        for name in names:
+            mask |= self.flags[self._find(self.flags, "flag", name, where)]
+        return mask
+
+    def item_ids(self, names, where):
+        return tuple(self.items[self._find(self.items, "item", name, where)] for name in names)
+
+    def scene(self, name, where):
+        return self._find(self.scenes, "scene", name, where)
+
+    def boss(self, name, where):
+        return self._find(self.bosses, "boss", name, where)
+
+
+def _lines(value):
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+def _compile_step(step, names, actions, where, nested=False):
+    """Check one step and resolve its names; returns a plain dict."""
+    if "use" in step:
+        if len(step) != 1:
+            raise ValueError(f"{where}: 'use' can't be mixed with anything else")
+        if step["use"] not in actions:
+            raise ValueError(f"{where}: no shared action {step['use']!r}")
+        return _compile_step(actions[step["use"]], names, actions, f"{where} (use {step['use']})", nested)
+    unknown = set(step) - STEP_KEYS
+    if unknown:
+        raise ValueError(f"{where}: unknown step keys {', '.join(sorted(unknown))}")
+    results = [key for key in RESULTS if key in step]
+    if len(results) > 1:
+        raise ValueError(f"{where}: a step ends one way, not with {' and '.join(results)}")
+    if results and nested:
+        raise ValueError(f"{where}: a stare-down or karaoke step can't {results[0]}")
+    out = {}
+    if "when" in step:
+        when = step["when"]
+        unknown = set(when) - {"flags", "not_flags", "items"}
+        if unknown:
+            raise ValueError(f"{where}: unknown conditions {', '.join(sorted(unknown))}")
+        out["when"] = (
+            names.flag_mask(when.get("flags", ()), where),
+            names.flag_mask(when.get("not_flags", ()), where),
+            names.item_ids(when.get("items", ()), where),
+        )
+    if "else" in step:
+        if "when" not in step:
+            raise ValueError(f"{where}: 'else' without 'when'")
+        out["else"] = _compile_step(step["else"], names, actions, f"{where} else", nested)
+    for key in ("art", "inventory", "inventory_line"):
+        if key in step:
+            out[key] = str(step[key])
+    if "say" in step:
+        out["say"] = _lines(step["say"])
+    for key in ("describe", "finish"):
+        if step.get(key):
+            out[key] = True
+    for key in ("take", "give"):
+        if key in step:
+            out[key] = names.item_ids(step[key], where)
+    for key in ("set", "clear"):
+        if key in step:
+            out[key] = names.flag_mask(step[key], where)
+    if "stat" in step:
+        for stat in step["stat"]:
+            if stat not in combat.MOVES:
+                raise ValueError(f"{where}: unknown stat {stat!r}")
+        out["stat"] = tuple(step["stat"].items())
+    for key in ("move", "go"):
+        if key in step:
+            out[key] = names.scene(step[key], where)
+    if "fight" in step:
+        out["fight"] = names.boss(step["fight"], where)
+    if "stare_down" in step:
+        stare = step["stare_down"]
+        out["stare_down"] = {
+            "prompt": stare["prompt"],
+            "rounds": int(stare["rounds"]),
+            "passes": tuple(stare["passes"]),
+            "fail": _compile_step(stare.get("fail", {}), names, actions, f"{where} fail", True),
+            "win": _compile_step(stare.get("win", {}), names, actions, f"{where} win", True),
+        }
+    if "karaoke" in step:
+        song = step["karaoke"]
+        out["karaoke"] = {
+            "lyrics": tuple(song["lyrics"]),
+            "fail": _compile_step(song.get("fail", {}), names, actions, f"{where} fail", True),
+            "win": _compile_step(song.get("win", {}), names, actions, f"{where} win", True),
+        }
+    return out
+
+
+def _compile_boss(name, fields, names):
+    where = f"bosses.toml [bosses.{name}]"
+    unknown = set(fields) - BOSS_FIELDS
+    if unknown:
+        raise ValueError(f"{where}: unknown fields {', '.join(sorted(unknown))}")
+    spec = dict(fields)
+    for key in ("intro", "hit_lines", "graze_lines", "miss_lines", "twerk_lines", "bogged_lines",
+                "unready_lines", "win_lines", "lose_lines"):
+        if key in spec:
+            spec[key] = _lines(spec[key])
+    if "move_lines" in spec:
+        spec["move_lines"] = {move: _lines(lines) for move, lines in spec["move_lines"].items()}
+    for key in ("requires", "loot"):
+        if key in spec:
+            spec[key] = names.item_ids(spec[key], where)
+    if "win_flag" in spec:
+        spec["win_flag"] = names.flag_mask((spec["win_flag"],), where)
+    for key in ("win_scene", "lose_scene", "unready_scene"):
+        if key in spec:
+            names.scene(spec[key], where)
+    if "consolation" in spec:
+        consolation = spec["consolation"]
+        spec["consolation"] = (
+            names.item_ids((consolation["item"],), where)[0],
+            names.flag_mask((consolation["flag"],), where),
+            consolation["line"],
+        )
+    if spec.get("on_miss", combat.HURT) not in (combat.HURT, combat.BOG, combat.TWERK):
+        raise ValueError(f"{where}: on_miss has to be hurt, bog or twerk")
+    return name, spec
+
+
+def compile_world(directory=WORLD_DIR):
+    """Read and check the data files; returns the marshallable world."""
+    import tomllib
+
+    data = {}
+    for source in SOURCES:
+        with open(os.path.join(directory, source), "rb") as file:
+            try:
+                data[source] = tomllib.load(file)
+            except tomllib.TOMLDecodeError as exc:
+                raise ValueError(f"{source}: {exc}") from None
+    items = data["items.toml"]
+    bosses = data["bosses.toml"].get("bosses", {})
+    scenes = data["scenes.toml"].get("scenes", {})
+    actions = data["scenes.toml"].get("actions", {})
+    names = _Names(items.get("flags", ()), items.get("items", {}), scenes, bosses)
+    if len(names.flags) > 32:
+        raise ValueError("items.toml: saved games have room for 32 flags")
+
+    compiled_items = tuple(
+        (item, entry["name"], int(entry.get("start", 0)), entry.get("icon"))
+        for item, entry in items.get("items", {}).items()
+    )
+    compiled_scenes = []
+    for name, scene in scenes.items():
+        where = f"scenes.toml [scenes.{name}]"
+        enter = scene.get("on_enter")
+        if enter is not None:
+            enter = _compile_step(enter, names, actions, f"{where} on_enter")
+        choices = []
+        for choice in scene.get("choices", ()):
+            choice = dict(choice)
+            command = choice.pop("command")
+            step = _compile_step(choice, names, actions, f"{where} {command!r}")
+            # a choice that only leads somewhere stays a plain scene name
+            choices.append((command, step["go"] if step.keys() == {"go"} else step))
+        compiled_scenes.append((name, scene["description"], scene.get("art"), enter, tuple(choices)))
+    return {
+        "flags": tuple(items.get("flags", ())),
+        "items": compiled_items,
+        "bosses": tuple(_compile_boss(name, fields, names) for name, fields in bosses.items()),
+        "scenes": tuple(compiled_scenes),
+    }
+
+
+def _tag():
+    return (sys.implementation.cache_tag or "").encode()[:16]
+
+
+def pack(compiled, source_stamp, digest):
+    header = HEADER.pack(MAGIC, VERSION, marshal.version, _tag(), source_stamp, digest)
+    return header + marshal.dumps(compiled, marshal.version)
+
+
+def read_header(data):
+    """``(stamp, digest)`` from an image, or None if this Python can't use it."""
+    if len(data) < HEADER.size:
+        return None
+    magic, version, marshal_version, tag, source_stamp, digest = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or marshal_version != marshal.version:
+        return None
+    if tag.rstrip(b"\0") != _tag():
+        return None
+    return source_stamp, digest
+
+
+def _unpack(data):
+    with memoryview(data) as view:
+        return marshal.loads(view[HEADER.size:])
+
+
+def _write(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write then rename, so nothing ever maps half an image
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "wb") as file:
+        file.write(data)
+    os.replace(temp, path)
+
+
+def _map(path):
+    try:
+        with open(path, "rb") as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # missing, unreadable or empty
+        return None
+
+
+def image(directory=WORLD_DIR, path=CACHE, force=False):
+    """The compiled world and its source digest, compiling only if the image is stale."""
+    source_stamp = stamp(directory)
+    data = None if force else _map(path)
+    if data is not None:
+        with data:
+            header = read_header(data)
+            if header is not None and header[0] == source_stamp:
+                return _unpack(data), header[1]
+            digest = source_digest(directory)
+            if header is not None and header[1] == digest:
+                compiled = _unpack(data)
+                _save(pack(compiled, source_stamp, digest), path)
+                return compiled, digest
+    else:
+        digest = source_digest(directory)
+    compiled = compile_world(directory)
+    _save(pack(compiled, source_stamp, digest), path)
+    return compiled, digest
+
+
+def _save(data, path):
+    try:
+        _write(data, path)
+    except OSError:
+        # a read-only home still gets a game, just compiled every time
+        pass
+
+
+# -- turning compiled steps into closures ----------------------------------
+
+
+def _say_all(lines):
+    if len(lines) == 1:
+        line = lines[0]
+        return lambda state: state.say(line)
+
+    def say(state):
+        for line in lines:
+            state.say(line)
+
+    return say
+
+
+def _effects(step, world, description):
+    """The step's side effects, in ``EFFECTS`` order, as a list of callables."""
+    ops = []
+    if "art" in step and "say" in step:
+        key, lines = step["art"], step["say"]
+
+        def show(state):
+            state.show_art(key)
+            for line in lines:
+                state.say(line)
+
+        ops.append(show)
+    elif "art" in step:
+        key = step["art"]
+        ops.append(lambda state: state.show_art(key))
+    elif "say" in step:
+        ops.append(_say_all(step["say"]))
+    if "describe" in step:
+        ops.append(lambda state: state.say(description))
+    if "inventory" in step:
+        heading = step["inventory"]
+        icons = tuple(world.item_art.items())
+        names = world.item_names
+
+        def inventory(state):
+            state.say(heading)
+            for item in state.item_names(names):
+                state.say(f"- {item}")
+            for item, key in icons:
+                if state.items[item]:
+                    state.show_art(key, game.ICON_WIDTH)
+
+        ops.append(inventory)
+    if "inventory_line" in step:
+        prefix = step["inventory_line"]
+        names = world.item_names
+        ops.append(lambda state: state.say(prefix + ", ".join(state.item_names(names))))
+    if "take" in step:
+        taken = step["take"]
+
+        def take(state):
+            for item in taken:
+                if state.items[item]:
+                    state.remove_item(item)
+
+        ops.append(take)
+    if "give" in step:
+        given = step["give"]
+
+        def give(state):
+            for item in given:
+                state.add_item(item)
+
+        ops.append(give)
+    if "set" in step:
+        flags = step["set"]
+        ops.append(lambda state: state.set_flag(flags))
+    if "clear" in step:
+        cleared = step["clear"]
+        ops.append(lambda state: state.clear_flag(cleared))
+    if "stat" in step:
+        stats = step["stat"]
+
+        def stat(state):
+            for name, amount in stats:
+                state.add_stat(name, amount)
+
+        ops.append(stat)
+    if "move" in step:
+        scene = step["move"]
+        ops.append(lambda state: state.move_to(scene))
+    if "finish" in step:
+        ops.append(lambda state: state.finish())
+    return ops
+
+
+def _run_all(ops):
+    if len(ops) == 1:
+        return ops[0]
+
+    def run(state):
+        for op in ops:
+            op(state)
+
+    return run
+
+
+def _stare_down(ops, stare, world, description):
+    prompt, rounds, passes = stare["prompt"], stare["rounds"], frozenset(stare["passes"])
+    fail = build_step(stare["fail"], world, description)
+    win = build_step(stare["win"], world, description)
+
+    def stare_down(state):
+        for op in ops:
+            op(state)
+        passed = 0
+        while passed < rounds:
+            reply = (yield prompt).strip().lower()
+            if reply not in passes:
+                fail(state)
+                return
+            passed += 1
+        win(state)
+
+    return stare_down
+
+
+def _karaoke(ops, song, world, description):
+    lyrics = song["lyrics"]
+    prompts = tuple(f"{line} " for line in lyrics)
+    fail = build_step(song["fail"], world, description)
+    win = build_step(song["win"], world, description)
+
+    def karaoke(state):
+        for op in ops:
+            op(state)
+        for line, prompt in zip(lyrics, prompts):
+            reply = (yield prompt).strip().upper()
+            if reply != line:
+                fail(state)
+                return
+        win(state)
+
+    return karaoke
+
+
+def build_step(step, world, description=""):
+    """One compiled step -> a callable taking a ``GameState``.
+
+    Like the functions scenes used to be written with, it returns the
+    next scene's name, a generator for the turn loop to drive, or None.
+    """
+    ops = _effects(step, world, description)
+    if "stare_down" in step:
+        body = _stare_down(ops, step["stare_down"], world, description)
+    elif "karaoke" in step:
+        body = _karaoke(ops, step["karaoke"], world, description)
+    else:
+        if "go" in step:
+            scene = step["go"]
+            ops.append(lambda state: scene)
+        elif "fight" in step:
+            spec = world.bosses[step["fight"]]
+            ops.append(lambda state: combat.play(spec, state))
+        if not ops:
+            body = game._no_hook
+        elif len(ops) == 1:
+            body = ops[0]
+        elif "go" in step or "fight" in step:
+            effects, result = ops[:-1], ops[-1]
+
+            def body(state):
+                for op in effects:
+                    op(state)
+                return result(state)
+        else:
+            body = _run_all(ops)
+    if "when" not in step:
+        return body
+    need, forbid, items = step["when"]
+    otherwise = build_step(step["else"], world, description) if "else" in step else _no_step
+    if not items:
+        def guarded(state):
+            flags = state.flags
+            if flags & need == need and not flags & forbid:
+                return body(state)
+            return otherwise(state)
+
+        return guarded
+
+    def guarded_items(state):
+        flags = state.flags
+        if flags & need == need and not flags & forbid:
+            held = state.items
+            for item in items:
+                if not held[item]:
+                    break
+            else:
+                return body(state)
+        return otherwise(state)
+
+    return guarded_items
+
+
+def _no_step(state):
+    return None
+
+
+class World:
+    """Everything in the data files, built and ready to play."""
+
+    def __init__(self, compiled, digest=b""):
+        self.digest = digest
+        self.flag_names = {1 << bit: name for bit, name in enumerate(compiled["flags"])}
+        self.item_ids = {item: index for index, (item, *_) in enumerate(compiled["items"])}
+        self.item_names = tuple(name for _, name, _, _ in compiled["items"])
+        self.starting_items = bytes(start for _, _, start, _ in compiled["items"])
+        self.item_art = {
+            index: icon for index, (_, _, _, icon) in enumerate(compiled["items"]) if icon
+        }
+        self.bosses = {name: combat.BossSpec(name, **fields) for name, fields in compiled["bosses"]}
+        scenes = {}
+        for name, description, art, enter, choices in compiled["scenes"]:
+            built = {
+                command: action if isinstance(action, str) else build_step(action, self, description)
+                for command, action in choices
+            }
+            on_enter = build_step(enter, self, description) if enter is not None else None
+            scenes[name] = game.Scene(name, description, built, on_enter=on_enter, art=art)
+        self.scenes = MappingProxyType(scenes)
+
+    def constants(self):
+        """The names game.py has always had: ``ZIPPO``, ``BEAT_LIZARD``, ``WATER_BUG``, ..."""
+        found = {
+            "FLAG_NAMES": self.flag_names,
+            "ITEM_NAMES": self.item_names,
+            "STARTING_ITEMS": self.starting_items,
+            "ITEM_ART": self.item_art,
+        }
+        found.update((name.upper(), flag) for flag, name in self.flag_names.items())
+        found.update((item.upper(), index) for item, index in self.item_ids.items())
+        found.update((name.upper(), spec) for name, spec in self.bosses.items())
+        return found
+
+
+def remap(state, old, new):
+    """Move ``state`` from world ``old`` onto ``new``, by name.
+
+    The scene, every item carried and every flag earned are looked up
+    by their names in ``new``, so content added or reordered in between
+    doesn't shift anything; items the player never saw start out as a
+    new session's would.  Returns what didn't survive: None, leaving
+    ``state`` alone, if its scene is gone, otherwise a list of the items
+    and flags that were dropped for not being in ``new`` any more.
+    """
+    scene = new.scenes.get(state.current_scene.name)
+    if scene is None:
+        return None
+    dropped = []
+    items = bytearray(new.starting_items)
+    held = state.items
+    for item, index in old.item_ids.items():
+        moved = new.item_ids.get(item)
+        if moved is not None:
+            items[moved] = held[index]
+        elif held[index]:
+            dropped.append(f"item {item!r}")
+    flags = 0
+    if state.flags:
+        bits = {name: flag for flag, name in new.flag_names.items()}
+        for flag, name in old.flag_names.items():
+            if state.flags & flag:
+                if name in bits:
+                    flags |= bits[name]
+                else:
+                    dropped.append(f"flag {name!r}")
+    state.scenes = new.scenes
+    state.current_scene = scene
+    state.items = items
+    state.flags = flags
+    return dropped
+
+
+def load(directory=WORLD_DIR, path=CACHE):
+    """The world from its image, compiling it first if the sources changed."""
+    compiled, digest = image(directory, path)
+    return World(compiled, digest)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the world's data files into its image.")
+    parser.add_argument("--dir", default=WORLD_DIR)
+    parser.add_argument("--image", default=CACHE)
+    parser.add_argument("--check", action="store_true", help="exit 1 if the image is stale")
+    parser.add_argument("--force", action="store_true", help="compile even if the image is current")
+    args = parser.parse_args(argv)
+    if args.check:
+        data = _map(args.image)
+        header = read_header(data) if data is not None else None
+        if header is None or header[1] != source_digest(args.dir):
+            print(f"{args.image} is out of date; run world.py")
+            return 1
+        print(f"world image up to date: {args.image}")
+        return 0
+    try:
+        began = time.perf_counter()
+        compiled, _ = image(args.dir, args.image, force=args.force)
+        loaded = World(compiled)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - began
+    size = os.path.getsize(args.image) if os.path.exists(args.image) else 0
+    print(
+        f"{len(loaded.scenes)} scenes, {len(loaded.item_names)} items, {len(loaded.flag_names)} flags, "
+        f"{len(loaded.bosses)} bosses: {args.image} ({size / 1e3:.1f} kB) in {elapsed * 1e3:.1f} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())